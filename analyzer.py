@@ -1,11 +1,20 @@
+import numpy as np
+
 from authenticity_checker import check_image_authenticity
-from predict import ml_predict
-from fusion import final_verdict_fusion
+from predict import ml_predict, ml_predict_batch
+from fusion import final_verdict_fusion, final_verdict_fusion_batch, map_scores
+from context import as_context
+
 
+def analyze_image(image):
+    """
+    Full pipeline for one image path or ImageAnalysisContext.
+    The image is decoded once and shared by every stage.
+    """
+    ctx = as_context(image)
 
-def analyze_image(image_path):
-    metadata_result, forensic_result = check_image_authenticity(image_path)
-    ml_result = ml_predict(image_path)
+    metadata_result, forensic_result = check_image_authenticity(ctx)
+    ml_result = ml_predict(ctx)
 
 
 
@@ -22,3 +31,36 @@ def analyze_image(image_path):
         "final_verdict": verdict,
         "confidence": score
     }
+
+
+def analyze_images(images):
+    """
+    Batch counterpart of analyze_image for many paths / contexts.
+    The forest runs once over the stacked feature matrix and the fusion
+    is vectorized; returns one result dict per input, in order.
+    """
+    contexts = [as_context(image) for image in images]
+
+    rule_results = [check_image_authenticity(ctx) for ctx in contexts]
+    ml_results = ml_predict_batch(contexts)
+
+    scores = np.array([
+        map_scores(metadata_result, forensic_result, ml_result)
+        for (metadata_result, forensic_result), ml_result in zip(rule_results, ml_results)
+    ]).reshape(-1, 3)
+
+    verdicts, final_scores = final_verdict_fusion_batch(
+        scores[:, 0], scores[:, 1], scores[:, 2]
+    )
+
+    return [
+        {
+            "metadata": metadata_result,
+            "forensic": forensic_result,
+            "ml": ml_result,
+            "final_verdict": str(verdict),
+            "confidence": float(score)
+        }
+        for (metadata_result, forensic_result), ml_result, verdict, score
+        in zip(rule_results, ml_results, verdicts, final_scores)
+    ]
@@ -1,19 +1,15 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import tempfile
-from PIL import Image
-from PIL.ExifTags import TAGS
+import io
 
 # --------- IMPORT YOUR PIPELINE ---------
 from authenticity_checker import check_image_authenticity
-from features import (
-    extract_metadata_features,
-    extract_advanced_forensic_features,
-    metadata_presence_report
-)
-from model import normalize_forensics, load_model, predict_image
+from features import metadata_presence_report
+from model import normalize_forensics, predict_image
+from model_registry import get_registry
 from fusion import final_verdict_fusion
+from context import ImageAnalysisContext
+from result_cache import content_hash, pipeline_version
 
 st.markdown(
     """
@@ -272,6 +268,58 @@ header {visibility: hidden;}
 </style>
 """, unsafe_allow_html=True)
 
+# --------- CACHED MODEL & ANALYSIS ---------
+# Streamlit reruns this script on every interaction; the model and the
+# per-upload results below survive reruns.
+@st.cache_resource
+def load_registry():
+    """Process-wide model holder (reloads itself only if the file changes)"""
+    registry = get_registry()
+    registry.warm_up()
+    return registry
+
+
+@st.cache_data(max_entries=32, show_spinner="Analyzing image...")
+def analyze_upload(upload_hash, version, _data, name):
+    """
+    Full analysis of one upload, cached by content hash and pipeline
+    version (_data itself is not hashed again by Streamlit).
+    """
+    from PIL import Image
+
+    ctx = ImageAnalysisContext(_data, name=name)
+    image = Image.open(io.BytesIO(_data))
+
+    metadata_result, forensic_result = check_image_authenticity(ctx)
+
+    # The forensic dict computed by the check above is reused here
+    ml_label, ml_conf = predict_image(
+        load_registry().get(), normalize_forensics(ctx.forensic)
+    )
+    ml_result = {
+        "label": ml_label,
+        "confidence": ml_conf
+    }
+
+    final_verdict, final_score = final_verdict_fusion(
+        metadata_result,
+        forensic_result,
+        ml_result
+    )
+
+    return {
+        "size": image.size,
+        "format": image.format,
+        "metadata": ctx.metadata,
+        "forensic_features": ctx.forensic,
+        "metadata_result": metadata_result,
+        "forensic_result": forensic_result,
+        "ml_result": ml_result,
+        "final_verdict": final_verdict,
+        "final_score": final_score
+    }
+
+
 # --------- IMAGE UPLOAD ---------
 uploaded_file = st.file_uploader(
     "Upload an image (JPG / PNG)",
@@ -279,29 +327,27 @@ uploaded_file = st.file_uploader(
 )
 
 if uploaded_file:
-    # Save uploaded image temporarily (preserves EXIF)
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-        tmp.write(uploaded_file.read())
-        image_path = tmp.name
-
-    image = Image.open(image_path)
+    # Analysed once per distinct upload; reruns hit the cache
+    data = uploaded_file.getvalue()
+    analysis = analyze_upload(content_hash(data), pipeline_version(), data, uploaded_file.name)
 
     # -------- IMAGE DISPLAY (FIXED SIZE) --------
     img_col, info_col = st.columns([1, 2])
 
     with img_col:
+        # Encoded bytes are served as-is, no decode on rerun
         st.image(
-            image,
+            data,
             caption="Uploaded Image",
             width=300
         )
 
     with info_col:
         st.markdown("### Image Information")
-        st.write(f"**Resolution:** {image.size[0]} × {image.size[1]}")
-        st.write(f"**Format:** {image.format}")
+        st.write(f"**Resolution:** {analysis['size'][0]} × {analysis['size'][1]}")
+        st.write(f"**Format:** {analysis['format']}")
 
-        if image.format not in ["JPEG", "JPG"]:
+        if analysis["format"] not in ["JPEG", "JPG"]:
             st.warning("EXIF metadata is usually available only for JPEG images.")
 
     st.divider()
@@ -311,12 +357,13 @@ if uploaded_file:
     # ============================================================
     st.header("Primary Expert-Rule Analysis")
 
-    metadata_result, forensic_result = check_image_authenticity(image_path)
+    metadata_result = analysis["metadata_result"]
+    forensic_result = analysis["forensic_result"]
 
     # ---------------- METADATA ----------------
     st.subheader("Metadata (EXIF) Analysis")
 
-    metadata = extract_metadata_features(image_path)
+    metadata = analysis["metadata"]
     presence = metadata_presence_report(metadata)
 
     meta_df = pd.DataFrame([
@@ -341,7 +388,7 @@ if uploaded_file:
     # ---------------- FORENSICS ----------------
     st.subheader("Forensic Feature Analysis")
 
-    forensic_features = extract_advanced_forensic_features(image_path)
+    forensic_features = analysis["forensic_features"]
 
     forensic_df = pd.DataFrame({
         "Forensic Feature": forensic_features.keys(),
@@ -367,15 +414,8 @@ if uploaded_file:
     st.divider()
     st.header("ML Prediction (Random Forest – Forensic Only)")
 
-    normalized_vector = normalize_forensics(forensic_features)
-
-    model = load_model("trained_model.pkl")
-    ml_label, ml_conf = predict_image(model, normalized_vector)
-
-    ml_result = {
-        "label": ml_label,
-        "confidence": ml_conf
-    }
+    ml_result = analysis["ml_result"]
+    ml_label, ml_conf = ml_result["label"], ml_result["confidence"]
 
     col5, col6 = st.columns(2)
     with col5:
@@ -413,11 +453,7 @@ if uploaded_file:
     st.divider()
     st.header("Final Fused Verdict")
 
-    final_verdict, final_score = final_verdict_fusion(
-        metadata_result,
-        forensic_result,
-        ml_result
-    )
+    final_verdict, final_score = analysis["final_verdict"], analysis["final_score"]
 
     col7, col8 = st.columns(2)
     with col7:
@@ -1,20 +1,15 @@
-from features import extract_metadata_features, interpret_forensics
+from features import interpret_forensics
+from context import as_context
 
 CORE_FEATURES = [
     "camera_make", "camera_model","lens_model", "datetime_original","gps_info","white_balance",
     "exposure_time", "f_number", "iso_speed","orientation","compression",
     "focal_length", "flash", "exif_version"
 ]
-from features import (
-    extract_advanced_forensic_features,
-    interpret_forensics,
-    extract_metadata_features
-)
 
 
-def check_image_authenticity(image_path):
-    # Metadata
-    metadata_features = extract_metadata_features(image_path)
+def metadata_verdict(metadata_features):
+    """(label, confidence) from the metadata presence flags"""
     meta_conf = sum(metadata_features.values()) / len(metadata_features)
 
     if meta_conf > 0.6:
@@ -24,10 +19,21 @@ def check_image_authenticity(image_path):
     else:
         meta_label = "METADATA MISSING"
 
-    metadata_result = (meta_label, round(meta_conf, 2))
+    return meta_label, round(meta_conf, 2)
+
+
+def check_image_authenticity(image):
+    """
+    Rule-based metadata + forensic verdicts.
+    Accepts an image path or an ImageAnalysisContext.
+    """
+    ctx = as_context(image)
+
+    # Metadata
+    metadata_result = metadata_verdict(ctx.metadata)
 
     # Forensics
-    forensic_features = extract_advanced_forensic_features(image_path)
-    forensic_result = interpret_forensics(forensic_features)
+    forensic_features = ctx.forensic
+    forensic_result = interpret_forensics(forensic_features, scale=ctx.scale)
 
     return metadata_result, forensic_result
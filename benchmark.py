@@ -0,0 +1,345 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from model_registry import file_fingerprint
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+# ---------------- CORPUS SPEC ----------------
+CORPUS_DIR = "benchmark_corpus"
+CORPUS_SEED = 1234
+
+SIZES_MP = (0.3, 2, 12, 50)
+QUICK_SIZES_MP = (0.3, 2)
+FORMATS = ("jpeg", "png")
+CONTENTS = ("smooth", "noisy")
+EXIF_VARIANTS = (True, False)
+
+# Functions timed, each in its own fresh process (so peak RSS is per target)
+TARGETS = (
+    "extract_advanced_forensic_features",
+    "check_image_authenticity",
+    "ml_predict",
+    "analyze_image"
+)
+
+# Values compared against the baseline; higher is worse for all of them
+COMPARED_STATS = ("p50_ms", "p95_ms", "peak_rss_mb")
+
+_NOISE_STRIP_ROWS = 512
+
+
+# ---------------- SYNTHETIC CORPUS ----------------
+def _dimensions(megapixels):
+    # 4:3 frame with about the requested pixel count
+    width = int(round(math.sqrt(megapixels * 1e6 * 4 / 3)))
+    return width, int(round(width * 3 / 4))
+
+
+def _render(rng, width, height, content):
+    """
+    RGB uint8 test image. "smooth" is a low-frequency colour field (like
+    an over-smoothed render); "noisy" adds sensor-like Gaussian noise.
+    Generated in strips so 50 MP images stay within a few hundred MB.
+    """
+    field = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    img = cv2.resize(field, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    if content == "noisy":
+        for r0 in range(0, height, _NOISE_STRIP_ROWS):
+            strip = img[r0:r0 + _NOISE_STRIP_ROWS]
+            noise = rng.normal(0, 12, size=strip.shape).astype(np.int16)
+            strip[:] = np.clip(strip.astype(np.int16) + noise, 0, 255)
+    return img
+
+
+def _camera_exif(index):
+    exif = Image.Exif()
+    exif[0x010F] = "BenchCam"                  # Make
+    exif[0x0110] = f"Model {index % 3}"        # Model
+    exif[0x0112] = 1                           # Orientation
+    exif[0x0131] = "benchmark.py"              # Software
+    sub = exif.get_ifd(0x8769)
+    sub[0x9003] = "2024:01:01 12:00:00"        # DateTimeOriginal
+    sub[0x829A] = 1 / 125                      # ExposureTime
+    sub[0x829D] = 2.8                          # FNumber
+    sub[0x8827] = 100                          # ISOSpeedRatings
+    sub[0x920A] = 4.2                          # FocalLength
+    return exif
+
+
+def corpus_spec(sizes_mp, seed=CORPUS_SEED):
+    """Ordered list of image descriptions; the same seed gives the same files"""
+    spec = []
+    for megapixels in sizes_mp:
+        for fmt in FORMATS:
+            for content in CONTENTS:
+                for with_exif in EXIF_VARIANTS:
+                    name = f"{megapixels:g}mp_{content}_{'exif' if with_exif else 'noexif'}.{fmt}"
+                    spec.append({
+                        "name": name,
+                        "megapixels": megapixels,
+                        "format": fmt,
+                        "content": content,
+                        "exif": with_exif,
+                        "seed": [seed, len(spec)]
+                    })
+    return spec
+
+
+def _write_image(item, path):
+    width, height = _dimensions(item["megapixels"])
+    rng = np.random.default_rng(item["seed"])
+    img = Image.fromarray(_render(rng, width, height, item["content"]))
+
+    options = {"exif": _camera_exif(item["seed"][1])} if item["exif"] else {}
+    if item["format"] == "jpeg":
+        img.save(path, "JPEG", quality=90, **options)
+    else:
+        img.save(path, "PNG", compress_level=1, **options)
+
+
+def build_corpus(corpus_dir, sizes_mp, seed=CORPUS_SEED):
+    """
+    Generates any missing corpus image and returns (paths, fingerprint).
+    A manifest of content hashes is kept next to the images; files that
+    no longer match it are regenerated.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    manifest_path = os.path.join(corpus_dir, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+
+    paths = []
+    for item in corpus_spec(sizes_mp, seed):
+        path = os.path.join(corpus_dir, item["name"])
+        key = f"{item['name']}:{seed}"
+        if not os.path.exists(path) or manifest.get(key) != file_fingerprint(path):
+            print(f"  generating {item['name']}", file=sys.stderr)
+            _write_image(item, path)
+            manifest[key] = file_fingerprint(path)
+        paths.append(path)
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    fingerprint = hashlib.sha256(
+        "".join(manifest[f"{os.path.basename(p)}:{seed}"] for p in paths).encode()
+    ).hexdigest()[:16]
+    return paths, fingerprint
+
+
+# ---------------- TIMING ----------------
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _target_function(target):
+    if target == "extract_advanced_forensic_features":
+        from features import extract_advanced_forensic_features
+        return extract_advanced_forensic_features
+    if target == "check_image_authenticity":
+        from authenticity_checker import check_image_authenticity
+        return check_image_authenticity
+    if target == "ml_predict":
+        from predict import ml_predict
+        return ml_predict
+    from analyzer import analyze_image
+    return analyze_image
+
+
+def time_target(target, paths, repeats):
+    """
+    Runs in a fresh process: calls target on every path `repeats` times
+    after one untimed warm-up call (model load, imports).
+    Returns ({path: [seconds, ...]}, peak RSS in MB).
+    """
+    fn = _target_function(target)
+    fn(paths[0])
+
+    timings = {path: [] for path in paths}
+    for _ in range(repeats):
+        for path in paths:
+            start = time.perf_counter()
+            fn(path)
+            timings[path].append(time.perf_counter() - start)
+    return timings, _peak_rss_mb()
+
+
+def _latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "calls": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "throughput_per_s": round(float(ms.size / (ms.sum() / 1000)), 3)
+    }
+
+
+def summarize(timings, peak_rss_mb, megapixels_of):
+    """Overall and per-resolution latency stats for one target"""
+    summary = _latency_stats([s for runs in timings.values() for s in runs])
+    summary["peak_rss_mb"] = peak_rss_mb
+
+    by_size = {}
+    for path, runs in timings.items():
+        by_size.setdefault(f"{megapixels_of[path]:g}", []).extend(runs)
+    summary["by_megapixels"] = {size: _latency_stats(runs) for size, runs in by_size.items()}
+    return summary
+
+
+# ---------------- BASELINE ----------------
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of regressions: every COMPARED_STATS value that grew
+    by more than `tolerance` (relative) over the baseline.
+    """
+    regressions = []
+    for target, current in results["targets"].items():
+        before = baseline.get("targets", {}).get(target)
+        if before is None:
+            continue
+        for stat in COMPARED_STATS:
+            old, new = before.get(stat), current.get(stat)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            if change > tolerance:
+                regressions.append(
+                    f"{target} {stat}: {old} -> {new} (+{change:.0%}, limit +{tolerance:.0%})"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the analysis pipeline on a deterministic synthetic corpus"
+    )
+    parser.add_argument("--corpus", default=CORPUS_DIR,
+                        help="where the generated images are kept (default: benchmark_corpus)")
+    parser.add_argument("--sizes", type=float, nargs="+",
+                        help=f"image sizes in megapixels (default: {' '.join(f'{s:g}' for s in SIZES_MP)})")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"small images only ({' '.join(f'{s:g}' for s in QUICK_SIZES_MP)} MP)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="timed calls per image and target (default: 3)")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--seed", type=int, default=CORPUS_SEED)
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json",
+                        help="results to compare against (default: benchmark_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown / memory growth (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    sizes = tuple(args.sizes or (QUICK_SIZES_MP if args.quick else SIZES_MP))
+
+    print(f"Preparing corpus in {args.corpus} ...", file=sys.stderr)
+    paths, fingerprint = build_corpus(args.corpus, sizes, args.seed)
+    megapixels_of = {
+        os.path.join(args.corpus, item["name"]): item["megapixels"]
+        for item in corpus_spec(sizes, args.seed)
+    }
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__
+        },
+        "corpus": {
+            "seed": args.seed,
+            "sizes_mp": list(sizes),
+            "images": len(paths),
+            "fingerprint": fingerprint
+        },
+        "repeats": args.repeats,
+        "targets": {}
+    }
+
+    # One fresh spawned process per target: imports, model load and
+    # peak RSS of one target never leak into the next
+    for target in args.targets:
+        print(f"Timing {target} ...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            timings, peak = executor.submit(time_target, target, paths, args.repeats).result()
+        results["targets"][target] = summarize(timings, peak, megapixels_of)
+
+    # -------- REPORT --------
+    print("\n========== BENCHMARK ==========")
+    print(f"{len(paths)} images ({', '.join(f'{s:g}' for s in sizes)} MP) x {args.repeats} repeats")
+    print(f"{'target':36} {'img/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    for target, r in results["targets"].items():
+        print(f"{target:36} {r['throughput_per_s']:>8.2f} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['peak_rss_mb'] or float('nan'):>8.1f}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    # A different corpus (sizes, seed, or encoder build changing the
+    # bytes) or repeat count makes the numbers incomparable: fail rather
+    # than report a pass that never compared anything
+    if baseline.get("corpus") != results["corpus"] or baseline.get("repeats") != args.repeats:
+        print("\n!!!!!!!!!! BASELINE MISMATCH !!!!!!!!!!")
+        print(f"  corpus  : {baseline.get('corpus')} -> {results['corpus']}")
+        print(f"  repeats : {baseline.get('repeats')} -> {args.repeats}")
+        print(f"  Re-run with the baseline's options, or --save-baseline to replace {args.baseline}")
+        return 2
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n!!!!!!!!!! PERFORMANCE REGRESSION !!!!!!!!!!")
+        for line in regressions:
+            print("  " + line)
+        return 1
+
+    print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+# Guard required: the timing processes re-import this module on spawn
+if __name__ == "__main__":
+    sys.exit(main())
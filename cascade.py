@@ -0,0 +1,209 @@
+import logging
+import os
+
+import numpy as np
+
+from authenticity_checker import metadata_verdict
+from context import as_context
+from features import (
+    to_full_resolution,
+    interpret_forensics,
+    forensic_normalized,
+    forensic_penalty,
+    ai_flag_count,
+    forensic_verdict
+)
+from fusion import (
+    FUSION_WEIGHTS,
+    final_verdict_fusion,
+    map_metadata_score,
+    map_forensic_score,
+    verdict_for_score
+)
+from predict import ml_predict_batch
+
+logger = logging.getLogger(__name__)
+
+# Stages in order of cost; the forest always decides if nothing before it did
+CASCADE_STAGES = ("exif", "global_stats", "forensics", "forest")
+
+# ---------------- CASCADE CONFIG (env overridable) ----------------
+# Stages allowed to stop early, and how far (in fused score) the bounds
+# must stay from a verdict threshold before they count as decisive
+CASCADE_EXIT_STAGES = tuple(
+    s.strip() for s in os.environ.get(
+        "TRUEFRAME_CASCADE_STAGES", "exif,global_stats,forensics"
+    ).split(",") if s.strip()
+)
+CASCADE_MARGIN = float(os.environ.get("TRUEFRAME_CASCADE_MARGIN", 0.0))
+
+for _stage in CASCADE_EXIT_STAGES:
+    if _stage not in CASCADE_STAGES:
+        logger.warning("Unknown cascade stage %r; expected one of %s", _stage, CASCADE_STAGES)
+
+FORENSIC_KEYS = (
+    "noise", "edge", "sharpness", "jpeg",
+    "cfa", "noise_inconsistency", "clipping", "entropy"
+)
+
+# Values of a not-yet-computed feature that raise the fewest / the most
+# AI red flags (every rule in ai_flag_count is monotone in each feature)
+_FEWEST_FLAGS = {
+    "noise": 0.0, "edge": np.inf, "sharpness": 0.0, "jpeg": 0.0,
+    "cfa": 0.0, "noise_inconsistency": 0.0, "clipping": 0.0, "entropy": np.inf
+}
+_MOST_FLAGS = {
+    "noise": np.inf, "edge": 0.0, "sharpness": np.inf, "jpeg": np.inf,
+    "cfa": np.inf, "noise_inconsistency": np.inf, "clipping": np.inf, "entropy": 0.0
+}
+
+
+# ---------------- SCORE BOUNDS ----------------
+def _score_for_penalty(penalty):
+    # Forensic score when there are fewer than 7 red flags; never
+    # increases with the penalty
+    return map_forensic_score(*forensic_verdict(0, penalty))
+
+
+def forensic_score_bounds(known):
+    """
+    (low, high) of the forensic fusion score given only some of the
+    forensic features (full-resolution values). Missing features are
+    assumed to take whichever value is worst / best for the score.
+    """
+    min_flags = ai_flag_count({**_FEWEST_FLAGS, **known})
+    max_flags = ai_flag_count({**_MOST_FLAGS, **known})
+
+    # Normalized values lie in [0, 1] and the penalty grows with each
+    n = forensic_normalized({**_FEWEST_FLAGS, **known})
+    n_low = {k: (v if k in known else 0.0) for k, v in n.items()}
+    n_high = {k: (v if k in known else 1.0) for k, v in n.items()}
+
+    low = 0.0 if max_flags >= 7 else _score_for_penalty(forensic_penalty(n_high))
+    high = 0.0 if min_flags >= 7 else _score_for_penalty(forensic_penalty(n_low))
+    return low, high
+
+
+def fused_bounds(metadata_score, forensic_bounds=(0.0, None), ml_bounds=(0.0, 1.0)):
+    """
+    (low, high) of the final fused score. forensic_bounds defaults to
+    the whole range interpret_forensics can produce.
+    """
+    forensic_low, forensic_high = forensic_bounds
+    if forensic_high is None:
+        forensic_high = _score_for_penalty(0.0)
+
+    low = (
+            FUSION_WEIGHTS["metadata"] * metadata_score +
+            FUSION_WEIGHTS["forensic"] * forensic_low +
+            FUSION_WEIGHTS["ml"] * ml_bounds[0]
+    )
+    high = (
+            FUSION_WEIGHTS["metadata"] * metadata_score +
+            FUSION_WEIGHTS["forensic"] * forensic_high +
+            FUSION_WEIGHTS["ml"] * ml_bounds[1]
+    )
+    return float(np.clip(low, 0.0, 1.0)), float(np.clip(high, 0.0, 1.0))
+
+
+def is_decisive(bounds, margin=CASCADE_MARGIN):
+    """True when every score in bounds (widened by margin) gets the same verdict"""
+    low, high = bounds
+    return verdict_for_score(low - margin) == verdict_for_score(high + margin)
+
+
+# ---------------- CASCADE ----------------
+def _early_result(stage, metadata_result, forensic_result, bounds):
+    low, high = bounds
+    return {
+        "metadata": metadata_result,
+        "forensic": forensic_result,
+        "ml": None,
+        "final_verdict": verdict_for_score(low),
+        "confidence": round((low + high) / 2, 2),
+        "decided_at": stage,
+        "confidence_range": [round(low, 2), round(high, 2)]
+    }
+
+
+def _cheap_stages(ctx, exit_stages, margin):
+    """
+    Runs the EXIF, global-statistics and forensic stages on one context.
+    Returns (result, None) when a stage was decisive, otherwise
+    (None, (metadata_result, forensic_result)) for the forest stage.
+    """
+
+    # 1. EXIF
+    metadata_result = metadata_verdict(ctx.metadata)
+    metadata_score = map_metadata_score(*metadata_result)
+
+    bounds = fused_bounds(metadata_score)
+    if "exif" in exit_stages and is_decisive(bounds, margin):
+        return _early_result("exif", metadata_result, None, bounds), None
+
+    if ctx.gray is None:
+        raise ValueError(f"Could not decode image {ctx.name or ''}".strip())
+
+    # 2. Cheap global statistics
+    if "global_stats" in exit_stages:
+        known = to_full_resolution(ctx.global_stats, ctx.scale)
+        bounds = fused_bounds(metadata_score, forensic_score_bounds(known))
+        if is_decisive(bounds, margin):
+            return _early_result("global_stats", metadata_result, None, bounds), None
+
+    # 3. Expensive forensic features
+    forensic_result = interpret_forensics(ctx.forensic, scale=ctx.scale)
+    forensic_score = map_forensic_score(*forensic_result)
+
+    bounds = fused_bounds(metadata_score, (forensic_score, forensic_score))
+    if "forensics" in exit_stages and is_decisive(bounds, margin):
+        return _early_result("forensics", metadata_result, forensic_result, bounds), None
+
+    return None, (metadata_result, forensic_result)
+
+
+def analyze_images_cascade(images, exit_stages=CASCADE_EXIT_STAGES, margin=CASCADE_MARGIN):
+    """
+    Early-exit counterpart of analyzer.analyze_images.
+
+    Each image goes through the stages in CASCADE_STAGES order and stops
+    at the first one after which the fused score can no longer cross a
+    verdict threshold, whatever the remaining stages return. The verdict
+    is therefore the one the full pipeline would give. Images that reach
+    the forest are classified together in one call.
+
+    Results have the analyze_image shape plus "decided_at" (the stage
+    that settled the verdict) and "confidence_range" (the fused score
+    bounds at that point). Skipped stages are reported as None and an
+    early "confidence" is the middle of the range.
+    """
+    contexts = [as_context(image) for image in images]
+    results = [None] * len(contexts)
+    pending = []
+
+    for i, ctx in enumerate(contexts):
+        results[i], rule_results = _cheap_stages(ctx, exit_stages, margin)
+        if results[i] is None:
+            pending.append((i, rule_results))
+
+    # 4. The forest
+    ml_results = ml_predict_batch([contexts[i] for i, _ in pending])
+
+    for (i, (metadata_result, forensic_result)), ml_result in zip(pending, ml_results):
+        verdict, score = final_verdict_fusion(metadata_result, forensic_result, ml_result)
+        results[i] = {
+            "metadata": metadata_result,
+            "forensic": forensic_result,
+            "ml": ml_result,
+            "final_verdict": verdict,
+            "confidence": score,
+            "decided_at": "forest",
+            "confidence_range": [score, score]
+        }
+
+    return results
+
+
+def analyze_image_cascade(image, exit_stages=CASCADE_EXIT_STAGES, margin=CASCADE_MARGIN):
+    """Early-exit counterpart of analyzer.analyze_image"""
+    return analyze_images_cascade([image], exit_stages, margin)[0]
@@ -0,0 +1,76 @@
+from functools import cached_property
+
+from features import (
+    read_image_bytes,
+    read_exif,
+    metadata_features_from_exif,
+    decode_grayscale,
+    global_forensic_stats,
+    forensic_features_from_gray,
+    dhash
+)
+
+
+# ---------------- PER-IMAGE ANALYSIS CONTEXT ----------------
+class ImageAnalysisContext:
+    """
+    Holds one uploaded image and everything derived from it.
+    The bytes are read once, and the grayscale decode, EXIF parse,
+    global statistics, perceptual hash and forensic features are each
+    computed lazily on first access and then reused by the metadata,
+    forensic and ML stages.
+
+    scale > 1 enables the reduced-resolution fast mode: pixels are decoded
+    at 1/scale and the forensic stages interpret them with that scale.
+    """
+
+    def __init__(self, data, name=None, scale=1):
+        self.data = data
+        self.name = name
+        self.scale = scale
+
+    @classmethod
+    def from_path(cls, image_path, scale=1):
+        return cls(read_image_bytes(image_path), name=str(image_path), scale=scale)
+
+    @classmethod
+    def from_buffer(cls, buffer, name=None, scale=1):
+        """Builds a context from a binary file-like object (e.g. an upload)"""
+        return cls(buffer.read(), name=name, scale=scale)
+
+    @cached_property
+    def gray(self):
+        return decode_grayscale(self.data, self.scale)
+
+    @cached_property
+    def exif(self):
+        return read_exif(self.data, name=self.name)
+
+    @cached_property
+    def metadata(self):
+        return metadata_features_from_exif(self.exif)
+
+    @cached_property
+    def global_stats(self):
+        if self.gray is None:
+            return None
+        return global_forensic_stats(self.gray)
+
+    @cached_property
+    def dhash(self):
+        if self.gray is None:
+            return None
+        return dhash(self.gray)
+
+    @cached_property
+    def forensic(self):
+        if self.gray is None:
+            return None
+        return forensic_features_from_gray(self.gray, global_stats=self.global_stats)
+
+
+def as_context(image, scale=1):
+    """Accepts an image path or an existing context and returns a context"""
+    if isinstance(image, ImageAnalysisContext):
+        return image
+    return ImageAnalysisContext.from_path(image, scale=scale)
@@ -1,37 +1,275 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
-from model import load_model
 
-# Load trained data
-X = np.load("X_train.npy")
-y = np.load("y_train.npy")
+from model import CLASS_LABELS, FEATURE_ORDER, train_model, export_forest, load_model
 
-# Load trained model
-model = load_model("trained_model.pkl")
+FEATURE_NAMES = [
+    "Noise", "Edge Density", "Sharpness", "JPEG Artifacts",
+    "CFA", "Noise Inconsistency", "Clipping", "Entropy"
+]
 
-# Predict on training data (or validation data if you add split)
-y_pred = model.predict(X)
+# Rows timed one at a time per fold (single-image latency)
+SINGLE_LATENCY_ROWS = 50
 
-# Confusion Matrix
-labels = ["Real", "Edited", "AI"]
-cm = confusion_matrix(y, y_pred)
 
-disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=labels)
-disp.plot(cmap="Blues")
+# ---------------- LATENCY (shared with model_sizing.py) ----------------
+def single_latency(model, X, rows=SINGLE_LATENCY_ROWS):
+    """Median seconds of one predict_proba call on one row (first `rows` rows)"""
+    times = []
+    for row in X[:rows]:
+        start = time.perf_counter()
+        model.predict_proba(row[None, :])
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) if times else float("nan")
 
-plt.title("ML Model Confusion Matrix")
-plt.show()
 
-importances = model.feature_importances_
-features = [
-    "Noise", "Edge Density", "Sharpness", "JPEG Artifacts",
-    "CFA", "Noise Inconsistency", "Clipping", "Entropy"
-]
+def batch_latency(model, X, repeats=1):
+    """Best-of-repeats seconds per image of one predict_proba call over X"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        best = min(best, time.perf_counter() - start)
+    return best / len(X)
+
+
+# ---------------- PER-FOLD WORK ----------------
+
+def run_fold(fold, X, y, train_idx, test_idx):
+    """
+    Trains the production model configuration on one training split
+    and scores its held-out split. Latency is measured for both the
+    sklearn model and its exported flat forest (what the workers serve).
+    """
+    X_train, y_train = np.asarray(X[train_idx]), np.asarray(y[train_idx])
+    X_test, y_test = np.asarray(X[test_idx]), np.asarray(y[test_idx])
+
+    start = time.perf_counter()
+    model = train_model(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    proba = np.zeros((len(X_test), len(CLASS_LABELS)))
+    proba[:, model.classes_] = model.predict_proba(X_test)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fold.forest")
+        export_forest(model, path)
+        flat = load_model(path)
+        latency = {
+            "sklearn_single": single_latency(model, X_test),
+            "sklearn_batch": batch_latency(model, X_test),
+            "flat_single": single_latency(flat, X_test),
+            "flat_batch": batch_latency(flat, X_test)
+        }
+        del flat
+
+    return {
+        "fold": fold,
+        "y_true": y_test,
+        "proba": proba,
+        "fit_seconds": fit_seconds,
+        "latency": latency,
+        "importances": model.feature_importances_
+    }
+
+
+def cross_validate(X, y, folds=5, n_jobs=-1, seed=42):
+    """Stratified k-fold; folds run in parallel, one process per fold"""
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    return Parallel(n_jobs=n_jobs)(
+        delayed(run_fold)(fold, X, y, train_idx, test_idx)
+        for fold, (train_idx, test_idx) in enumerate(splitter.split(np.zeros(len(y)), y))
+    )
+
+
+# ---------------- METRICS ----------------
+def summarize(fold_results, n_bins=5):
+    """Out-of-fold metrics: per-class precision / recall, calibration, latency"""
+    from sklearn.calibration import calibration_curve
+    from sklearn.metrics import (
+        accuracy_score, brier_score_loss, confusion_matrix, precision_recall_fscore_support
+    )
+
+    y_true = np.concatenate([r["y_true"] for r in fold_results])
+    proba = np.concatenate([r["proba"] for r in fold_results])
+    y_pred = proba.argmax(axis=1)
+    labels = list(range(len(CLASS_LABELS)))
+
+    precision, recall, f1, support = precision_recall_fscore_support(
+        y_true, y_pred, labels=labels, zero_division=0
+    )
+
+    per_class, calibration = {}, {}
+    for i, name in enumerate(CLASS_LABELS):
+        per_class[name] = {
+            "precision": float(precision[i]),
+            "recall": float(recall[i]),
+            "f1": float(f1[i]),
+            "support": int(support[i])
+        }
+
+        # One-vs-rest reliability of the class probability
+        positives = (y_true == i).astype(int)
+        if 0 < positives.sum() < len(positives):
+            frac, mean_pred = calibration_curve(positives, proba[:, i], n_bins=n_bins, strategy="quantile")
+            calibration[name] = {
+                "mean_predicted": mean_pred.tolist(),
+                "fraction_positive": frac.tolist(),
+                "brier": float(brier_score_loss(positives, proba[:, i]))
+            }
+
+    fold_accuracy = [
+        float(accuracy_score(r["y_true"], r["proba"].argmax(axis=1))) for r in fold_results
+    ]
+
+    return {
+        "samples": int(len(y_true)),
+        "folds": len(fold_results),
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "fold_accuracy": fold_accuracy,
+        "fold_accuracy_std": float(np.std(fold_accuracy)),
+        "per_class": per_class,
+        "confusion_matrix": confusion_matrix(y_true, y_pred, labels=labels).tolist(),
+        "calibration": calibration,
+        "per_fold": [
+            {"fold": r["fold"], "fit_seconds": r["fit_seconds"], "latency": r["latency"]}
+            for r in fold_results
+        ],
+        "feature_importance": dict(zip(
+            FEATURE_ORDER,
+            np.mean([r["importances"] for r in fold_results], axis=0).tolist()
+        ))
+    }
+
+
+# ---------------- PLOTS ----------------
+def write_plots(report, out_dir):
+    """Writes PNG plots into out_dir (Agg backend, never opens a window)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import ConfusionMatrixDisplay
+
+    paths = []
+
+    def save(fig, name):
+        path = os.path.join(out_dir, name)
+        fig.tight_layout()
+        fig.savefig(path, dpi=120)
+        plt.close(fig)
+        paths.append(path)
+
+    # Confusion matrix
+    fig, ax = plt.subplots(figsize=(5, 4))
+    ConfusionMatrixDisplay(
+        confusion_matrix=np.array(report["confusion_matrix"]), display_labels=CLASS_LABELS
+    ).plot(cmap="Blues", ax=ax, colorbar=False)
+    ax.set_title("Out-of-fold Confusion Matrix")
+    save(fig, "confusion_matrix.png")
+
+    # Calibration (reliability) curves, one-vs-rest
+    fig, ax = plt.subplots(figsize=(5, 5))
+    ax.plot([0, 1], [0, 1], "k--", linewidth=1, label="perfectly calibrated")
+    for name, curve in report["calibration"].items():
+        ax.plot(curve["mean_predicted"], curve["fraction_positive"], "o-",
+                label=f"{name} (Brier {curve['brier']:.3f})")
+    ax.set_xlabel("Mean predicted probability")
+    ax.set_ylabel("Fraction of positives")
+    ax.set_title("Calibration")
+    ax.legend(loc="upper left")
+    save(fig, "calibration.png")
+
+    # Feature importance
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.barh(FEATURE_NAMES, list(report["feature_importance"].values()))
+    ax.set_xlabel("Importance (mean over folds)")
+    ax.set_title("Forensic Feature Importance (Random Forest)")
+    save(fig, "feature_importance.png")
+
+    # Inference latency per fold
+    fig, ax = plt.subplots(figsize=(7, 4))
+    folds = [f["fold"] for f in report["per_fold"]]
+    kinds = list(report["per_fold"][0]["latency"])
+    width = 0.8 / len(kinds)
+    for k, kind in enumerate(kinds):
+        ax.bar([f + k * width for f in folds],
+               [f["latency"][kind] * 1e3 for f in report["per_fold"]], width, label=kind)
+    ax.set_xticks([f + 0.4 - width / 2 for f in folds], [str(f) for f in folds])
+    ax.set_xlabel("Fold")
+    ax.set_ylabel("ms per image")
+    ax.set_yscale("log")
+    ax.set_title("Inference Latency")
+    ax.legend()
+    save(fig, "latency.png")
+
+    return paths
+
+
+def print_report(report):
+    print("\n========== CROSS-VALIDATION ==========")
+    print(f"Samples / folds : {report['samples']} / {report['folds']}")
+    print(f"Accuracy        : {report['accuracy']:.3f} "
+          f"(fold std {report['fold_accuracy_std']:.3f})")
+
+    print(f"\n{'class':8} {'precision':>9} {'recall':>7} {'f1':>6} {'support':>8} {'brier':>6}")
+    for name, m in report["per_class"].items():
+        brier = report["calibration"].get(name, {}).get("brier", float("nan"))
+        print(f"{name:8} {m['precision']:9.3f} {m['recall']:7.3f} {m['f1']:6.3f} "
+              f"{m['support']:8d} {brier:6.3f}")
+
+    print(f"\n{'fold':4} {'fit s':>7} " + " ".join(f"{k:>15}" for k in report["per_fold"][0]["latency"]))
+    for f in report["per_fold"]:
+        print(f"{f['fold']:4} {f['fit_seconds']:7.2f} "
+              + " ".join(f"{v * 1e3:12.3f} ms" for v in f["latency"].values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stratified k-fold evaluation of the forensic Random Forest "
+                    "on the cached feature matrices written by train.py"
+    )
+    parser.add_argument("--X", default="X_train.npy", help="feature matrix (.npy)")
+    parser.add_argument("--y", default="y_train.npy", help="labels (.npy)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel folds (-1 = all cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bins", type=int, default=5, help="calibration curve bins")
+    parser.add_argument("--out", default="evaluation", help="directory for report.json and plots")
+    parser.add_argument("--no-plots", action="store_true", help="only write report.json")
+    args = parser.parse_args()
+
+    # Memory-mapped: folds read slices, the matrix is never copied whole
+    X = np.load(args.X, mmap_mode="r")
+    y = np.load(args.y, mmap_mode="r")
+
+    smallest = int(np.unique(y, return_counts=True)[1].min())
+    if args.folds > smallest:
+        parser.error(f"--folds {args.folds} exceeds the smallest class size ({smallest})")
+
+    start = time.perf_counter()
+    fold_results = cross_validate(X, y, args.folds, args.jobs, args.seed)
+    report = summarize(fold_results, args.bins)
+    report["seconds"] = time.perf_counter() - start
+
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    if not args.no_plots:
+        for path in write_plots(report, args.out):
+            print("Wrote", path)
+    print(f"\nEvaluation finished in {report['seconds']:.1f} s; report in {args.out}/report.json")
+
 
-plt.figure(figsize=(8, 4))
-plt.barh(features, importances)
-plt.xlabel("Importance")
-plt.title("Forensic Feature Importance (Random Forest)")
-plt.tight_layout()
-plt.show()
+# Guard required: joblib worker processes re-import this module
+if __name__ == "__main__":
+    main()
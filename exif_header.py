@@ -0,0 +1,360 @@
+import io
+import struct
+import zlib
+
+# ---------------- TAGS ----------------
+# Numeric ids of the EXIF tags behind features.EXIF_TO_FEATURE
+# (names as in PIL.ExifTags.TAGS). All live in IFD0 or the Exif sub-IFD;
+# GPSInfo is the IFD0 pointer to the GPS sub-IFD, so only its presence
+# matters.
+EXIF_TAG_IDS = {
+    0x010F: "Make",
+    0x0110: "Model",
+    0xA434: "LensModel",
+    0x9003: "DateTimeOriginal",
+    0x8825: "GPSInfo",
+    0x829A: "ExposureTime",
+    0x829D: "FNumber",
+    0x8827: "ISOSpeedRatings",
+    0x920A: "FocalLength",
+    0x9209: "Flash",
+    0xA403: "WhiteBalance",
+    0x9207: "MeteringMode",
+    0x0112: "Orientation",
+    0x0128: "ResolutionUnit",
+    0x011A: "XResolution",
+    0x011B: "YResolution",
+    0x0103: "Compression",
+    0x0131: "Software",
+    0x013B: "Artist",
+    0x8298: "Copyright",
+    0x9000: "ExifVersion"
+}
+
+EXIF_IFD_POINTER = 0x8769
+
+# TIFF field type -> bytes per value (the types PIL decodes; entries of
+# any other type are ignored, as PIL does)
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4, 16: 8}
+
+# Unsigned integer types that can hold an inline sub-IFD offset
+_OFFSET_FORMATS = {1: "B", 3: "H", 4: "L", 13: "L"}
+
+EXIF_PREFIX = b"Exif\x00\x00"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_RAW_PROFILE = b"Raw profile type exif"
+
+
+# ---------------- TIFF / IFD ----------------
+def _read_ifd(fp, base, offset, endian):
+    """
+    {tag: (type, count, value field)} of the IFD at offset (relative to
+    base). Mirrors PIL: unsupported types and empty values are skipped,
+    and a truncated entry or out-of-range value ends the directory.
+    """
+    entries = {}
+
+    fp.seek(base + offset)
+    head = fp.read(2)
+    if len(head) < 2:
+        return entries
+    (count,) = struct.unpack(endian + "H", head)
+
+    table = fp.read(12 * count)
+    end = fp.seek(0, io.SEEK_END)
+
+    for pos in range(0, len(table) - 11, 12):
+        tag, typ, n, value = struct.unpack(endian + "HHL4s", table[pos:pos + 12])
+        unit = _TYPE_SIZES.get(typ)
+        if unit is None or n == 0:
+            continue
+
+        size = n * unit
+        if size > 4:
+            (data_offset,) = struct.unpack(endian + "L", value)
+            if base + data_offset + size > end:
+                break
+        entries[tag] = (typ, n, value)
+
+    return entries
+
+
+def _sub_ifd_offset(entry, endian):
+    typ, n, value = entry
+    fmt = _OFFSET_FORMATS.get(typ)
+    if fmt is None or n != 1:
+        return None
+    return struct.unpack_from(endian + fmt, value)[0]
+
+
+def tiff_tag_ids(fp, base=0):
+    """
+    EXIF_TAG_IDS present in IFD0 or the Exif sub-IFD of the TIFF
+    structure starting at base in fp.
+    """
+    fp.seek(base)
+    header = fp.read(8)
+    if header[:4] == b"II*\x00":
+        endian = "<"
+    elif header[:4] == b"MM\x00*":
+        endian = ">"
+    else:
+        raise ValueError("EXIF block is not a TIFF structure")
+
+    (ifd0,) = struct.unpack(endian + "L", header[4:])
+    entries = _read_ifd(fp, base, ifd0, endian)
+    tags = set(entries)
+
+    if EXIF_IFD_POINTER in entries:
+        offset = _sub_ifd_offset(entries[EXIF_IFD_POINTER], endian)
+        if offset is not None:
+            tags.update(_read_ifd(fp, base, offset, endian))
+
+    return {tag for tag in tags if tag in EXIF_TAG_IDS}
+
+
+def exif_block_tag_ids(block):
+    """Tag ids of a raw EXIF block (TIFF data, optionally "Exif\\0\\0"-prefixed)"""
+    while block.startswith(EXIF_PREFIX):
+        block = block[len(EXIF_PREFIX):]
+    if not block:
+        return None
+    return tiff_tag_ids(io.BytesIO(block))
+
+
+# ---------------- CONTAINERS ----------------
+def _jpeg_exif(fp):
+    # Marker segments up to the first scan; the first APP1 "Exif" wins
+    fp.seek(2)
+    while True:
+        marker = fp.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF:
+            marker = marker[1:] + fp.read(1)
+            if len(marker) < 2:
+                return None
+
+        code = marker[1]
+        if code in (0xD9, 0xDA):
+            return None
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+
+        length = fp.read(2)
+        if len(length) < 2:
+            return None
+        (length,) = struct.unpack(">H", length)
+
+        if code == 0xE1:
+            segment = fp.read(length - 2)
+            if segment.startswith(EXIF_PREFIX):
+                return segment
+        else:
+            fp.seek(length - 2, io.SEEK_CUR)
+
+
+def _png_text(chunk_type, data):
+    # (keyword, text) of a tEXt / zTXt / iTXt chunk
+    keyword, _, rest = data.partition(b"\x00")
+    if chunk_type == b"zTXt":
+        rest = zlib.decompress(rest[1:])
+    elif chunk_type == b"iTXt":
+        compressed = rest[:1] == b"\x01"
+        rest = rest[2:].split(b"\x00", 2)[-1]
+        if compressed:
+            rest = zlib.decompress(rest)
+    return keyword, rest.decode("latin-1")
+
+
+def _png_exif(fp):
+    # eXIf chunk, else an ImageMagick "Raw profile type exif" text chunk.
+    # IDAT and other chunk bodies are skipped without being read.
+    fp.seek(len(PNG_SIGNATURE))
+    raw_profile = None
+
+    while True:
+        header = fp.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">L4s", header)
+
+        if chunk_type == b"eXIf":
+            return fp.read(length)
+        if chunk_type == b"IEND":
+            break
+
+        if chunk_type in (b"tEXt", b"zTXt", b"iTXt") and raw_profile is None:
+            keyword = fp.read(min(length, len(PNG_RAW_PROFILE) + 1))
+            if keyword == PNG_RAW_PROFILE + b"\x00":
+                _, text = _png_text(chunk_type, keyword + fp.read(length - len(keyword)))
+                raw_profile = bytes.fromhex("".join(text.split("\n")[3:]))
+                fp.seek(4, io.SEEK_CUR)
+            else:
+                fp.seek(length - len(keyword) + 4, io.SEEK_CUR)
+        else:
+            fp.seek(length + 4, io.SEEK_CUR)
+
+    return raw_profile
+
+
+def _webp_exif(fp):
+    # RIFF chunks after the "WEBP" form type; bodies are padded to even
+    fp.seek(12)
+    while True:
+        header = fp.read(8)
+        if len(header) < 8:
+            return None
+        fourcc, size = struct.unpack("<4sL", header)
+        if fourcc == b"EXIF":
+            return fp.read(size)
+        fp.seek(size + (size & 1), io.SEEK_CUR)
+
+
+def _boxes(fp, start, end):
+    # (type, payload start, payload end) of the ISO-BMFF boxes in [start, end)
+    pos = start
+    while pos + 8 <= end:
+        fp.seek(pos)
+        size, box_type = struct.unpack(">L4s", fp.read(8))
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", fp.read(8))
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _uint(data, pos, size):
+    return int.from_bytes(data[pos:pos + size], "big"), pos + size
+
+
+def _exif_item_id(iinf):
+    # item_ID of the first "Exif" item in an iinf box payload
+    version = iinf[0]
+    pos = 6 if version == 0 else 8
+    stream = io.BytesIO(iinf)
+
+    for box_type, start, end in _boxes(stream, pos, len(iinf)):
+        if box_type != b"infe" or iinf[start] < 2:
+            continue
+        id_size = 2 if iinf[start] == 2 else 4
+        item_id, pos = _uint(iinf, start + 4, id_size)
+        if iinf[pos + 2:pos + 6] == b"Exif":
+            return item_id
+    return None
+
+
+def _item_extents(iloc, item_id):
+    # (construction_method, [(offset, length), ...]) of one iloc item
+    version = iloc[0]
+    offset_size, length_size = iloc[4] >> 4, iloc[4] & 0x0F
+    base_offset_size = iloc[5] >> 4
+    index_size = iloc[5] & 0x0F if version in (1, 2) else 0
+
+    id_size = 2 if version < 2 else 4
+    count, pos = _uint(iloc, 6, id_size)
+
+    for _ in range(count):
+        current, pos = _uint(iloc, pos, id_size)
+        method = 0
+        if version in (1, 2):
+            method, pos = _uint(iloc, pos, 2)
+            method &= 0x0F
+        pos += 2    # data_reference_index
+        base, pos = _uint(iloc, pos, base_offset_size)
+        extent_count, pos = _uint(iloc, pos, 2)
+
+        extents = []
+        for _ in range(extent_count):
+            pos += index_size
+            offset, pos = _uint(iloc, pos, offset_size)
+            length, pos = _uint(iloc, pos, length_size)
+            extents.append((base + offset, length))
+
+        if current == item_id:
+            return method, extents
+    return None, []
+
+
+def _heif_exif(fp):
+    # HEIC / HEIF / AVIF: the "Exif" item listed in meta/iinf, located
+    # through meta/iloc (file offsets, or offsets into meta/idat)
+    end = fp.seek(0, io.SEEK_END)
+
+    meta = next(((s, e) for t, s, e in _boxes(fp, 0, end) if t == b"meta"), None)
+    if meta is None:
+        return None
+
+    children = {}
+    for box_type, start, stop in _boxes(fp, meta[0] + 4, meta[1]):
+        children.setdefault(box_type, (start, stop))
+    if b"iinf" not in children or b"iloc" not in children:
+        return None
+
+    def payload(box_type):
+        start, stop = children[box_type]
+        fp.seek(start)
+        return fp.read(stop - start)
+
+    item_id = _exif_item_id(payload(b"iinf"))
+    if item_id is None:
+        return None
+
+    method, extents = _item_extents(payload(b"iloc"), item_id)
+    if method == 0:
+        origin = 0
+    elif method == 1 and b"idat" in children:
+        origin = children[b"idat"][0]
+    else:
+        return None
+
+    data = b""
+    for offset, length in extents:
+        fp.seek(origin + offset)
+        data += fp.read(length)
+
+    # Item payload: 4-byte offset to the TIFF header, then the EXIF data
+    if len(data) < 4:
+        return None
+    (tiff_offset,) = struct.unpack(">L", data[:4])
+    return data[4 + tiff_offset:]
+
+
+# ---------------- ENTRY POINT ----------------
+def read_exif_tags(fp):
+    """
+    EXIF_TAG_IDS present in an image, read from a seekable binary file
+    object by walking only the container headers (JPEG APP1, PNG eXIf,
+    WebP EXIF chunk, HEIF Exif item, or a bare TIFF). Pixel data is
+    skipped, never read. Returns None when the image carries no EXIF;
+    raises ValueError for an unrecognised format.
+    """
+    fp.seek(0)
+    head = fp.read(12)
+    if not head:
+        return None
+
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return tiff_tag_ids(fp)
+
+    if head[:2] == b"\xff\xd8":
+        block = _jpeg_exif(fp)
+    elif head[:8] == PNG_SIGNATURE:
+        block = _png_exif(fp)
+    elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        block = _webp_exif(fp)
+    elif head[4:8] == b"ftyp":
+        block = _heif_exif(fp)
+    elif head[:3] == b"GIF" or head[:2] == b"BM":
+        return None
+    else:
+        raise ValueError("unrecognised image format")
+
+    if not block:
+        return None
+    return exif_block_tag_ids(block)
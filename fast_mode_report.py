@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import (
+    SUPPORTED_SCALES,
+    SCALE_CALIBRATION_PATH,
+    read_image_bytes,
+    extract_advanced_forensic_features_from_buffer,
+    interpret_forensics
+)
+from model import FEATURE_ORDER, CLASS_LABELS, normalize_forensics, predict_images
+from model_registry import get_model
+from train import DATASET_DIR, list_dataset
+
+
+def _extract_scales(args):
+    """Worker job: features + decode/extract time of one image at every scale"""
+    path, scales = args
+    data = read_image_bytes(path)
+
+    out = {}
+    for scale in scales:
+        start = time.perf_counter()
+        features = extract_advanced_forensic_features_from_buffer(data, scale)
+        out[scale] = (features, time.perf_counter() - start)
+    return path, out
+
+
+def fit_calibration(full, reduced):
+    """
+    Per-feature multiplier mapping reduced-scale values onto full
+    resolution: the median ratio over images where both are finite and
+    the reduced value is non-zero.
+    """
+    factors = {}
+    for key in FEATURE_ORDER:
+        a = np.array([f[key] for f in full], dtype=np.float64)
+        b = np.array([f[key] for f in reduced], dtype=np.float64)
+        ok = np.isfinite(a) & np.isfinite(b) & (b != 0)
+        factors[key] = float(np.median(a[ok] / b[ok])) if ok.any() else 1.0
+    return factors
+
+
+def _rescale(features, factors):
+    return {k: v * factors.get(k, 1.0) for k, v in features.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calibrate fast mode and measure its accuracy / speed trade-off"
+    )
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    parser.add_argument("--scales", type=int, nargs="+", default=[2, 4, 8],
+                        choices=[s for s in SUPPORTED_SCALES if s > 1])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--calibration", default=SCALE_CALIBRATION_PATH,
+                        help="where to write the per-scale calibration")
+    parser.add_argument("--report", default="fast_mode_report.json")
+    parser.add_argument("--no-write", action="store_true",
+                        help="report only, keep the existing calibration file")
+    args = parser.parse_args()
+
+    items = list_dataset(args.dataset)
+    labels = dict(items)
+    scales = [1] + sorted(set(args.scales))
+
+    with ProcessPoolExecutor(max_workers=args.workers or 1) as executor:
+        jobs = [(path, scales) for path, _ in items]
+        results = dict(executor.map(_extract_scales, jobs, chunksize=4))
+
+    # Images that fail to decode at any scale are left out of every row
+    paths = [
+        p for p, _ in items
+        if all(results[p][s][0] is not None for s in scales)
+    ]
+    y = np.array([labels[p] for p in paths])
+
+    full = [results[p][1][0] for p in paths]
+    full_time = np.mean([results[p][1][1] for p in paths])
+
+    model = get_model()
+    full_pred = predict_images(model, [normalize_forensics(f) for f in full])
+    full_rules = [interpret_forensics(f)[0] for f in full]
+
+    calibration, rows = {}, []
+
+    for scale in scales:
+        features = [results[p][scale][0] for p in paths]
+        factors = {} if scale == 1 else fit_calibration(full, features)
+        rescaled = [_rescale(f, factors) for f in features]
+
+        pred = predict_images(model, [normalize_forensics(f) for f in rescaled])
+        rules = [interpret_forensics(f)[0] for f in rescaled]
+        pred_idx = np.array([CLASS_LABELS.index(label) for label, _ in pred])
+
+        seconds = np.mean([results[p][scale][1] for p in paths])
+        rows.append({
+            "scale": scale,
+            "images": len(paths),
+            "ml_accuracy": float(np.mean(pred_idx == y)),
+            "ml_agreement_with_full": float(np.mean([a[0] == b[0] for a, b in zip(pred, full_pred)])),
+            "rule_agreement_with_full": float(np.mean([a == b for a, b in zip(rules, full_rules)])),
+            "extract_ms": round(seconds * 1000, 2),
+            "speedup": round(full_time / seconds, 2)
+        })
+        if scale > 1:
+            calibration[str(scale)] = factors
+
+    # -------- REPORT --------
+    print("\n========== FAST MODE TRADE-OFF (training set) ==========")
+    print(f"{'scale':>5} {'ML acc':>8} {'ML agree':>9} {'rule agree':>11} {'ms/img':>8} {'speedup':>8}")
+    for r in rows:
+        print(f"{r['scale']:>5} {r['ml_accuracy']:>8.3f} {r['ml_agreement_with_full']:>9.3f} "
+              f"{r['rule_agreement_with_full']:>11.3f} {r['extract_ms']:>8.1f} {r['speedup']:>7.1f}x")
+
+    with open(args.report, "w") as f:
+        json.dump({"rows": rows, "calibration": calibration}, f, indent=2)
+    print(f"\nReport written to {args.report}")
+
+    if not args.no_write:
+        with open(args.calibration, "w") as f:
+            json.dump(calibration, f, indent=2)
+        print(f"Calibration written to {args.calibration}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+from features import (
+    read_image_bytes, extract_advanced_forensic_features_from_buffer, extractor_version
+)
+from model_registry import file_fingerprint
+
+DEFAULT_STORE_PATH = "feature_store.db"
+
+
+def encode_features(features):
+    # Keep each value's dtype so reloaded features are bit-identical
+    # (some are float32, and normalize_forensics preserves that)
+    if features is None:
+        return None
+    return json.dumps({
+        k: [np.asarray(v).dtype.str, float(v)]
+        for k, v in features.items()
+    })
+
+
+def decode_features(encoded):
+    if encoded is None:
+        return None
+    return {
+        k: np.dtype(dtype).type(value)
+        for k, (dtype, value) in json.loads(encoded).items()
+    }
+
+
+def extract_file_features(path):
+    """
+    Worker job: reads one file, hashes it and extracts its raw forensic
+    features from the same bytes. Returns a record for FeatureStore.put.
+    """
+    st = os.stat(path)
+    data = read_image_bytes(path)
+    return {
+        "path": path,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "version": extractor_version(),
+        "features": extract_advanced_forensic_features_from_buffer(data)
+    }
+
+
+# ---------------- PERSISTENT FEATURE STORE ----------------
+class FeatureStore:
+    """
+    SQLite cache of raw forensic features per image file.
+
+    Entries are keyed by path and validated by size + mtime; when those
+    changed, the content hash decides whether the stored features are
+    still valid (e.g. a file that was only touched or copied back).
+    Every entry also records the extractor_version() that produced it;
+    entries from another version are misses and get re-extracted.
+    Undecodable images are stored too (features = None) so they are not
+    retried until the file changes.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, version=None):
+        self.path = path
+        self.version = version or extractor_version()
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " features TEXT,"
+            " version TEXT)"
+        )
+        # Stores written before versioning lack the column; their rows
+        # (version NULL) never match and are re-extracted
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(features)")}
+        if "version" not in columns:
+            self._db.execute("ALTER TABLE features ADD COLUMN version TEXT")
+        self._db.commit()
+
+    def lookup(self, path):
+        """
+        Returns (hit, features). features may be None on a hit when the
+        image is known to be undecodable.
+        """
+        row = self._db.execute(
+            "SELECT size, mtime_ns, sha256, features FROM features WHERE path = ? AND version = ?",
+            (path, self.version)
+        ).fetchone()
+        if row is None:
+            return False, None
+
+        size, mtime_ns, sha256, encoded = row
+        st = os.stat(path)
+        if (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+            return True, decode_features(encoded)
+
+        if st.st_size == size and file_fingerprint(path) == sha256:
+            # Same content, new mtime: refresh the stat so next time is cheap
+            self._db.execute(
+                "UPDATE features SET mtime_ns = ? WHERE path = ?",
+                (st.st_mtime_ns, path)
+            )
+            return True, decode_features(encoded)
+
+        return False, None
+
+    def put(self, record):
+        self._db.execute(
+            "INSERT OR REPLACE INTO features (path, size, mtime_ns, sha256, features, version)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (record["path"], record["size"], record["mtime_ns"],
+             record["sha256"], encode_features(record["features"]), record["version"])
+        )
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
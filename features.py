@@ -1,6 +1,11 @@
-# ---------------- METADATA FEATURES ----------------
-from PIL import Image
-from PIL.ExifTags import TAGS
+# ---------------- RAW IMAGE BUFFERS ----------------
+import io
+import logging
+
+from exif_header import EXIF_TAG_IDS, read_exif_tags
+from metrics import STAGE_SECONDS, FEATURE_SECONDS, IMAGE_PIXELS, timed
+
+logger = logging.getLogger(__name__)
 
 # EXIF → feature mapping
 EXIF_TO_FEATURE = {
@@ -27,31 +32,89 @@ EXIF_TO_FEATURE = {
     "ExifVersion": "exif_version"
 }
 
+# Numeric EXIF tag id → feature
+_TAG_ID_TO_FEATURE = {tag_id: EXIF_TO_FEATURE[name] for tag_id, name in EXIF_TAG_IDS.items()}
+
+def read_image_bytes(image_path):
+    """Reads an image file into memory (empty bytes if unreadable)"""
+    try:
+        with open(image_path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        logger.warning("Could not read %s: %s", image_path, e)
+        return b""
+
+
+def _as_bytes(buffer):
+    """Accepts bytes / bytearray / memoryview or a binary file-like object"""
+    if hasattr(buffer, "read"):
+        return buffer.read()
+    return buffer
+
+
+# ---------------- METADATA FEATURES ----------------
 def extract_metadata_features(image_path):
     """
     Extracts EXIF metadata presence as binary flags.
+    Only the file's header bytes are read, never the pixel data.
     Returns: dict(feature_name -> 0/1)
     """
 
-    # Initialize all features to 0
-    features = {v: 0 for v in EXIF_TO_FEATURE.values()}
-
     try:
-        img = Image.open(image_path)
-        exif = img._getexif()
+        f = open(image_path, "rb")
+    except OSError as e:
+        logger.warning("Could not read %s: %s", image_path, e)
+        return metadata_features_from_exif(None)
+
+    with f:
+        return extract_metadata_features_from_buffer(f, name=image_path)
 
-        if not exif:
-            return features
 
-        for tag_id in exif:
-            tag = TAGS.get(tag_id, tag_id)
+def extract_metadata_features_from_buffer(buffer, name=None):
+    """
+    In-memory counterpart of extract_metadata_features.
+    Accepts raw encoded bytes or a seekable binary file-like object.
+    """
+
+    return metadata_features_from_exif(read_exif(buffer, name=name))
 
-            if tag in EXIF_TO_FEATURE:
-                feature_name = EXIF_TO_FEATURE[tag]
-                features[feature_name] = 1
+
+def read_exif(buffer, name=None):
+    """
+    Parses the EXIF block of encoded image bytes (or a seekable file-like
+    object) from the container headers alone, without decoding pixels.
+    Returns the set of EXIF tag ids present (see EXIF_TAG_IDS), or None
+    when there is no (readable) EXIF.
+    """
+    fp = buffer if hasattr(buffer, "read") else io.BytesIO(buffer)
+
+    try:
+        with timed(STAGE_SECONDS, stage="exif"):
+            return read_exif_tags(fp)
 
     except Exception as e:
-        print(f"[WARN] EXIF read failed for {image_path}: {e}")
+        logger.warning("EXIF read failed for %s: %s", name or "buffer", e)
+
+    return None
+
+
+def metadata_features_from_exif(exif):
+    """
+    Maps already parsed EXIF tag ids (a set, or any dict keyed by tag id)
+    to binary presence flags.
+    Returns: dict(feature_name -> 0/1)
+    """
+
+    # Initialize all features to 0
+    features = {v: 0 for v in EXIF_TO_FEATURE.values()}
+
+    if not exif:
+        return features
+
+    for tag_id in exif:
+        if tag_id in _TAG_ID_TO_FEATURE:
+            feature_name = _TAG_ID_TO_FEATURE[tag_id]
+            features[feature_name] = 1
 
     return features
 
@@ -75,9 +138,173 @@ def metadata_presence_report(metadata: dict) -> dict:
 
 
 # ---------------- ADVANCED FORENSIC FEATURES ----------------
-import cv2
+import hashlib
+import json
+import os
+import threading
+
 import numpy as np
 
+# cv2 is imported inside the functions that use it, so importing this
+# module (e.g. in the API process, which only needs SUPPORTED_SCALES)
+# does not load OpenCV
+
+# ---------------- REDUCED-RESOLUTION FAST MODE ----------------
+# scale = N decodes at 1/N of the width and height. For JPEG, OpenCV uses
+# libjpeg DCT scaling, so the full image is never reconstructed. Other
+# formats are decoded fully and then downsampled.
+_DECODE_FLAGS = {
+    1: "IMREAD_GRAYSCALE",
+    2: "IMREAD_REDUCED_GRAYSCALE_2",
+    4: "IMREAD_REDUCED_GRAYSCALE_4",
+    8: "IMREAD_REDUCED_GRAYSCALE_8"
+}
+SUPPORTED_SCALES = tuple(_DECODE_FLAGS)
+
+# Per-scale multipliers mapping reduced-scale feature values back to
+# full-resolution equivalents (written by fast_mode_report.py)
+SCALE_CALIBRATION_PATH = os.environ.get(
+    "TRUEFRAME_SCALE_CALIBRATION", "scale_calibration.json"
+)
+_scale_calibration = None
+_uncalibrated_warned = set()
+
+
+def load_scale_calibration():
+    """{scale: {feature: multiplier}}; empty when not calibrated yet"""
+    global _scale_calibration
+    if _scale_calibration is None:
+        try:
+            with open(SCALE_CALIBRATION_PATH) as f:
+                _scale_calibration = {
+                    int(scale): factors
+                    for scale, factors in json.load(f).items()
+                }
+        except FileNotFoundError:
+            _scale_calibration = {}
+    return _scale_calibration
+
+
+def to_full_resolution(features, scale=1):
+    """
+    Maps features computed at a reduced scale onto the full-resolution
+    ranges that interpret_forensics and normalize_forensics expect.
+    At scale 1 the dict is returned unchanged.
+    """
+    if scale == 1 or features is None:
+        return features
+
+    calibration = load_scale_calibration()
+    if scale not in calibration and scale not in _uncalibrated_warned:
+        logger.warning("Scale %s is not calibrated (see fast_mode_report.py); using raw values", scale)
+        _uncalibrated_warned.add(scale)
+
+    factors = calibration.get(scale, {})
+    return {k: v * factors.get(k, 1.0) for k, v in features.items()}
+
+# ---------------- EXTRACTOR VERSION ----------------
+_source_hash = None
+
+
+def extractor_version(scale=1, memory_budget=None):
+    """
+    Identifies what produced a set of raw forensic features: this
+    module's source, the OpenCV / NumPy builds, the decode scale and the
+    tile budget (tiled and whole-image values differ in the last bits).
+    Stored features from any other version must be extracted again.
+    """
+    import cv2
+
+    global _source_hash
+    if _source_hash is None:
+        with open(__file__, "rb") as f:
+            _source_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    if memory_budget is None:
+        memory_budget = TILE_MEMORY_BUDGET
+    return f"{_source_hash}-cv{cv2.__version__}-np{np.__version__}-s{scale}-t{memory_budget}"
+
+# ---------------- SCRATCH BUFFERS ----------------
+# Full-image intermediates (Canny edges, int16 Laplacian, shifted
+# difference, CFA residual) are written into one per-thread byte buffer
+# that is reused across stages and calls. Buffers above the cap are
+# allocated per call instead of being kept alive in the worker.
+SCRATCH_MAX_BYTES = int(float(os.environ.get("TRUEFRAME_SCRATCH_MB", 256)) * 1024 * 1024)
+
+_scratch = threading.local()
+
+
+def _scratch_array(shape, dtype):
+    """Uninitialized array over the calling thread's scratch buffer"""
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    if nbytes > SCRATCH_MAX_BYTES:
+        return np.empty(shape, dtype=dtype)
+
+    buf = getattr(_scratch, "buf", None)
+    if buf is None or buf.size < nbytes:
+        buf = _scratch.buf = np.empty(nbytes, dtype=np.uint8)
+    return buf[:nbytes].view(dtype).reshape(shape)
+
+
+def _integer_variance(total, total_sq, n):
+    # Population variance from exact integer sums; only the final
+    # division rounds
+    if n == 0:
+        return float("nan")
+    return (n * total_sq - total * total) / (n * n)
+
+
+def _sum_and_square_sum(arr):
+    # Σx and Σx² of an integer array, one OpenCV pass each and no
+    # temporaries. OpenCV returns them as doubles; both are integers far
+    # below 2**50 here, so rounding recovers them exactly.
+    import cv2
+
+    if arr.size == 0:
+        return 0, 0
+    return round(cv2.sumElems(arr)[0]), round(cv2.norm(arr, cv2.NORM_L2SQR))
+
+
+# ---------------- BLOCK STATISTICS ----------------
+def block_std(img, size=32, block_rows=16):
+    """
+    Standard deviation of every size×size block, vectorized.
+
+    Uses the same grid as the original per-block loop: blocks start at
+    0, size, 2*size ... while start < dim - size (so a trailing block
+    that ends exactly on the border is skipped). Each strip of block rows
+    is reshaped into a (rows, size, cols, size) view and reduced with
+    exact integer sums of x and x², bounding temporaries to one strip.
+    Returns a flat float64 array in row-major block order.
+    """
+    h, w = img.shape
+    ny = len(range(0, h - size, size))
+    nx = len(range(0, w - size, size))
+    return _block_std_grid(img, ny, nx, size, block_rows)
+
+
+def _block_std_grid(img, ny, nx, size=32, block_rows=16):
+    # Per-block std of the first ny × nx blocks of img (see block_std)
+    if ny == 0 or nx == 0:
+        return np.empty(0)
+
+    n = size * size
+    out = np.empty((ny, nx))
+
+    for y0 in range(0, ny, block_rows):
+        y1 = min(ny, y0 + block_rows)
+        strip = img[y0 * size:y1 * size, :nx * size]
+        strip = strip.reshape(y1 - y0, size, nx, size)
+
+        s = strip.sum(axis=(1, 3), dtype=np.int64)
+        sq = np.square(strip, dtype=np.uint32).sum(axis=(1, 3), dtype=np.int64)
+
+        # n*Σx² - (Σx)² is exact in int64, so the only rounding is the sqrt
+        out[y0:y1] = np.sqrt((n * sq - s * s) / (n * n))
+
+    return out.ravel()
+
+
 def _normalize(val, low, high):
     """Maps value to 0–1 based on expected real-image range"""
     return float(np.clip((val - low) / (high - low), 0, 1))
@@ -89,76 +316,355 @@ def extract_advanced_forensic_features(image_path):
     Returns a dictionary (for interpretability)
     """
 
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    return extract_advanced_forensic_features_from_buffer(
+        read_image_bytes(image_path)
+    )
+
+
+def extract_advanced_forensic_features_from_buffer(buffer, scale=1):
+    """
+    In-memory counterpart of extract_advanced_forensic_features.
+    Accepts raw encoded bytes or a binary file-like object.
+    scale > 1 computes the features on a 1/scale decode (fast mode);
+    interpret / normalize them with the same scale.
+    """
+
+    img = decode_grayscale(buffer, scale)
     if img is None:
         return None
 
+    return forensic_features_from_gray(img)
+
+
+def decode_grayscale(buffer, scale=1):
+    """
+    Decodes encoded image bytes to a grayscale uint8 array (None on failure),
+    optionally at 1/scale resolution.
+    """
+    import cv2
+
+    if scale not in _DECODE_FLAGS:
+        raise ValueError(f"Unsupported scale {scale}; use one of {SUPPORTED_SCALES}")
+
+    buf = np.frombuffer(_as_bytes(buffer), dtype=np.uint8)
+    if buf.size == 0:
+        return None
+
+    with timed(STAGE_SECONDS, stage="decode"):
+        img = cv2.imdecode(buf, getattr(cv2, _DECODE_FLAGS[scale]))
+
+    if img is not None:
+        IMAGE_PIXELS.set(img.size)
+    return img
+
+
+def global_forensic_stats(img, memory_budget=None):
+    """
+    The cheap whole-image statistics (noise level, clipping ratio and
+    entropy) on their own, so they can be judged before the expensive
+    local features are computed.
+    """
+
+    if memory_budget is None:
+        memory_budget = TILE_MEMORY_BUDGET
+    if memory_budget and img.size * _BYTES_PER_PIXEL > memory_budget:
+        with timed(STAGE_SECONDS, stage="global_stats_tiled"):
+            return _hist_global_stats(_strip_histogram(img, memory_budget), img.size)
+
+    # Noise level (std), clipping ratio and entropy all come from one
+    # histogram pass instead of three full-image passes
+    with timed(FEATURE_SECONDS, feature="histogram"):
+        return _hist_global_stats(_gray_histogram(img), img.size)
+
+
+def forensic_features_from_gray(img, memory_budget=None, global_stats=None):
+    """
+    Computes the forensic feature dict from an already decoded
+    grayscale image, so callers that hold the pixels never decode twice.
+    Images whose full-size temporaries would exceed memory_budget bytes
+    (default TILE_MEMORY_BUDGET) are processed in strips instead.
+    global_stats may pass in an earlier global_forensic_stats(img).
+    """
+    import cv2
+
+    if memory_budget is None:
+        memory_budget = TILE_MEMORY_BUDGET
+    if memory_budget and img.size * _BYTES_PER_PIXEL > memory_budget:
+        # Features are accumulated together per strip, so only the total is timed
+        with timed(STAGE_SECONDS, stage="features_tiled"):
+            return forensic_features_tiled(img, memory_budget)
+
+    if global_stats is None:
+        global_stats = global_forensic_stats(img, memory_budget)
+
     h, w = img.shape
+    n = img.size
 
-    #  Global noise level
-    noise_std = np.std(img)
+    # The stages below take turns writing into the same scratch buffer
 
     # Edge density
-    edges = cv2.Canny(img, 100, 200)
-    edge_density = np.mean(edges > 0)
+    with timed(FEATURE_SECONDS, feature="edge"):
+        edges = cv2.Canny(img, 100, 200, edges=_scratch_array((h, w), np.uint8))
+        edge_density = np.float64(cv2.countNonZero(edges) / n)
 
     #  Sharpness (sensor vs AI smoothing)
-    sharpness = cv2.Laplacian(img, cv2.CV_64F).var()
+    with timed(FEATURE_SECONDS, feature="sharpness"):
+        # The 3x3 Laplacian of uint8 lies in [-1020, 1020], so int16 is
+        # exact at a quarter of the float64 bandwidth
+        laplacian = cv2.Laplacian(img, cv2.CV_16S, dst=_scratch_array((h, w), np.int16))
+        sharpness = np.float64(_integer_variance(*_sum_and_square_sum(laplacian), n))
 
     #  JPEG block artifact strength
-    jpeg_blocks = np.mean(np.abs(img[8:, :] - img[:-8, :]))
+    with timed(FEATURE_SECONDS, feature="jpeg"):
+        # Same wrapping uint8 difference as img[8:] - img[:-8] (abs of
+        # uint8 is a no-op)
+        diff = np.subtract(img[8:], img[:-8], out=_scratch_array((max(0, h - 8), w), np.uint8))
+        jpeg_blocks = np.float64(cv2.sumElems(diff)[0] / diff.size if diff.size else np.nan)
 
     #  CFA residual (sensor pattern hint)
-    h, w = img.shape
-
-    # Force even dimensions
-    h2 = h - (h % 2)
-    w2 = w - (w % 2)
+    with timed(FEATURE_SECONDS, feature="cfa"):
+        # Force even dimensions
+        h2 = h - (h % 2)
+        w2 = w - (w % 2)
 
-    img_even = img[:h2, :w2]
+        img_even = img[:h2, :w2]
 
-    cfa_residual = np.std(
-        img_even[::2, ::2].astype(np.float32) -
-        img_even[1::2, 1::2].astype(np.float32)
-    )
+        residual = np.subtract(
+            img_even[::2, ::2], img_even[1::2, 1::2],
+            dtype=np.int16, out=_scratch_array((h2 // 2, w2 // 2), np.int16)
+        )
+        cfa_residual = np.float32(np.sqrt(
+            _integer_variance(*_sum_and_square_sum(residual), residual.size)
+        ))
 
     # Local noise inconsistency (IMPORTANT)
-    blocks = []
-    for y in range(0, h - 32, 32):
-        for x in range(0, w - 32, 32):
-            block = img[y:y+32, x:x+32]
-            blocks.append(np.std(block))
-    noise_inconsistency = np.std(blocks)
-
-    #  Saturation / clipping ratio
-    clipped = np.mean((img <= 2) | (img >= 253))
-
-    #  Texture richness (entropy)
-    hist = cv2.calcHist([img], [0], None, [256], [0, 256])
-    hist /= hist.sum() + 1e-8
-    entropy = -np.sum(hist * np.log2(hist + 1e-8))
+    with timed(FEATURE_SECONDS, feature="noise_inconsistency"):
+        noise_inconsistency = np.std(block_std(img, 32))
 
     return {
-        "noise": noise_std,
+        "noise": global_stats["noise"],
         "edge": edge_density,
         "sharpness": sharpness,
         "jpeg": jpeg_blocks,
         "cfa": cfa_residual,
         "noise_inconsistency": noise_inconsistency,
-        "clipping": clipped,
-        "entropy": entropy
+        "clipping": global_stats["clipping"],
+        "entropy": global_stats["entropy"]
     }
 
 
+def _hist_entropy(hist):
+    # hist: float32 (256, 1) counts, as returned by cv2.calcHist
+    hist /= hist.sum() + 1e-8
+    return -np.sum(hist * np.log2(hist + 1e-8))
+
+
+# ---------------- TILED (BOUNDED-MEMORY) EXTRACTION ----------------
+# Budget for per-image temporaries; 0 disables tiling.
+TILE_MEMORY_BUDGET = int(float(os.environ.get("TRUEFRAME_TILE_BUDGET_MB", 0)) * 1024 * 1024)
+
+# Rough peak bytes of temporaries per pixel (Canny buffers, float64
+# Laplacian and its variance, shifted differences, masks)
+_BYTES_PER_PIXEL = 40
+
+# Rows of context above/below each strip. Canny's gradient / NMS need 2,
+# the Laplacian 1, the JPEG difference 8; the rest absorbs hysteresis
+# chains that cross strip borders.
+_TILE_HALO = 32
+
+
+class _RunningMoments:
+    """Mergeable count / mean / M2 (Welford–Chan) for streaming variance"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, values):
+        n_b = values.size
+        if n_b == 0:
+            return
+        mean_b = float(values.mean())
+        m2_b = float(np.square(values - mean_b).sum())
+
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+
+    def var(self):
+        return self.m2 / self.n if self.n else float("nan")
+
+
+def _strip_rows(width, memory_budget):
+    # Strip height: a multiple of 32 (block grid and CFA rows stay
+    # aligned) that fits the budget together with its halo
+    rows = memory_budget // max(1, width * _BYTES_PER_PIXEL) - 2 * _TILE_HALO
+    # calcHist counts are float32 per strip, so keep them exact (< 2**24)
+    rows = min(rows, (1 << 24) // max(1, width))
+    return max(32, rows // 32 * 32)
+
+
+def _strip_histogram(img, memory_budget):
+    # Exact int64 grey-level counts, accumulated strip by strip
+    import cv2
+
+    strip = _strip_rows(img.shape[1], memory_budget)
+    hist = np.zeros(256, dtype=np.int64)
+    for r0 in range(0, img.shape[0], strip):
+        hist += cv2.calcHist([img[r0:r0 + strip]], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+    return hist
+
+
+def _gray_histogram(img):
+    # Exact int64 grey-level counts; calcHist's float32 counts are only
+    # exact below 2**24, so taller images are counted in row bands
+    import cv2
+
+    rows = max(1, (1 << 24) // max(1, img.shape[1]))
+    hist = np.zeros(256, dtype=np.int64)
+    for r0 in range(0, img.shape[0], rows):
+        hist += cv2.calcHist([img[r0:r0 + rows]], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+    return hist
+
+
+def _hist_global_stats(hist, n):
+    # noise / clipping / entropy from int64 grey-level counts
+    levels = np.arange(256, dtype=np.int64)
+    s1 = int((hist * levels).sum())
+    s2 = int((hist * levels * levels).sum())
+
+    return {
+        "noise": np.float64(np.sqrt(_integer_variance(s1, s2, n))),
+        "clipping": np.float64((hist[:3].sum() + hist[253:].sum()) / n),
+        "entropy": _hist_entropy(hist.astype(np.float32).reshape(256, 1))
+    }
+
+
+def forensic_features_tiled(img, memory_budget):
+    """
+    Same features as forensic_features_from_gray, computed over
+    horizontal strips so temporaries scale with the strip, not the image.
+
+    Each feature is accumulated across strips: a running histogram gives
+    noise, clipping and entropy; Welford/Chan moments give the Laplacian
+    and CFA variances; sums give edge density and JPEG strength; block
+    stds are collected per strip. Values match the whole-image path up
+    to float rounding, except that Canny's hysteresis is only followed
+    _TILE_HALO rows past a strip, which can in rare cases drop a weak
+    edge chain crossing a strip border.
+    """
+    import cv2
+
+    h, w = img.shape
+    strip = _strip_rows(w, memory_budget)
+
+    hist = np.zeros(256, dtype=np.int64)
+    edge_count = 0
+    jpeg_sum = 0
+    sharpness = _RunningMoments()
+    cfa = _RunningMoments()
+    block_stds = []
+
+    h2 = h - (h % 2)
+    w2 = w - (w % 2)
+    ny = len(range(0, h - 32, 32))
+    nx = len(range(0, w - 32, 32))
+
+    for r0 in range(0, h, strip):
+        r1 = min(h, r0 + strip)
+        core = img[r0:r1]
+
+        # Window with halo rows; core rows sit at [r0 - a0, r1 - a0)
+        a0 = max(0, r0 - _TILE_HALO)
+        a1 = min(h, r1 + _TILE_HALO)
+        window = img[a0:a1]
+
+        hist += cv2.calcHist([core], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+
+        edges = cv2.Canny(window, 100, 200)
+        edge_count += cv2.countNonZero(edges[r0 - a0:r1 - a0])
+
+        sharpness.add(cv2.Laplacian(window, cv2.CV_64F)[r0 - a0:r1 - a0])
+
+        # Same uint8 (wrapping) difference as img[8:] - img[:-8]
+        j0 = max(r0, 8)
+        if j0 < r1:
+            jpeg_sum += int((img[j0:r1] - img[j0 - 8:r1 - 8]).sum(dtype=np.uint64))
+
+        # r0 is even, so row pairs (2k, 2k + 1) never straddle strips
+        c1 = min(r1, h2)
+        if r0 < c1:
+            pairs = img[r0:c1, :w2]
+            cfa.add(pairs[::2, ::2].astype(np.float64) - pairs[1::2, 1::2])
+
+        b0 = r0 // 32
+        b1 = min(ny, r1 // 32)
+        if b0 < b1:
+            block_stds.append(_block_std_grid(img[b0 * 32:b1 * 32], b1 - b0, nx, 32))
+
+    n = h * w
+    stats = _hist_global_stats(hist, n)
+
+    jpeg_count = max(0, h - 8) * w
+    blocks = np.concatenate(block_stds) if block_stds else np.empty(0)
+
+    return {
+        "noise": stats["noise"],
+        "edge": np.float64(edge_count / n),
+        "sharpness": np.float64(sharpness.var()),
+        "jpeg": np.float64(jpeg_sum / jpeg_count if jpeg_count else np.nan),
+        "cfa": np.float32(np.sqrt(cfa.var())),
+        "noise_inconsistency": np.std(blocks),
+        "clipping": stats["clipping"],
+        "entropy": stats["entropy"]
+    }
+
+
+# ---------------- PERCEPTUAL HASH ----------------
+def dhash(img, size=8):
+    """
+    Difference hash of a grayscale array: size*size bits, one per
+    horizontally adjacent pair of a (size+1)xsize thumbnail. Stable
+    under re-encoding, resizing and metadata stripping.
+    """
+    import cv2
+
+    with timed(STAGE_SECONDS, stage="dhash"):
+        small = cv2.resize(img, (size + 1, size), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
 # ---------------- FORENSIC INTERPRETATION ----------------
-def interpret_forensics(f):
+def interpret_forensics(f, scale=1):
     """
     Robust forensic interpretation
     Tuned for modern smartphone images
+    (features from a reduced-scale decode are rescaled first)
     """
 
+    with timed(STAGE_SECONDS, stage="rules"):
+        f = to_full_resolution(f, scale)
+
+        n = forensic_normalized(f)
+        penalty = forensic_penalty(n)
+
+        # Optional debug (TRUEFRAME_LOG_LEVEL=DEBUG)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Digital Forensic Extraction",
+                extra={"normalized": {k: round(v, 2) for k, v in n.items()}}
+            )
+
+        return forensic_verdict(ai_flag_count(f), penalty)
+
+
+def forensic_normalized(f):
     # --- NORMALIZATION (UPDATED RANGES) ---
-    n = {
+    return {
         "noise": _normalize(f["noise"], 8, 45),                     # phones are noisy
         "edge": _normalize(f["edge"], 0.01, 0.35),
         "sharpness": _normalize(np.log1p(f["sharpness"]), 2.0, 7.5),
@@ -169,30 +675,32 @@ def interpret_forensics(f):
         "cfa": _normalize(f["cfa"], 1.0, 22)                       # ISP breaks CFA
     }
 
-    # --- WEIGHTS ---
-    weights = {
-        "noise": 0.05,
-        "edge": 0.05,
-        "sharpness": 0.10,
-        "jpeg": 0.20,
-        "noise_inconsistency": 0.30,   # primary forensic signal
-        "clipping": 0.05,
-        "entropy": 0.15,
-        "cfa": 0.10
-    }
 
+# --- WEIGHTS ---
+FORENSIC_WEIGHTS = {
+    "noise": 0.05,
+    "edge": 0.05,
+    "sharpness": 0.10,
+    "jpeg": 0.20,
+    "noise_inconsistency": 0.30,   # primary forensic signal
+    "clipping": 0.05,
+    "entropy": 0.15,
+    "cfa": 0.10
+}
+
+
+def forensic_penalty(n):
     penalty = 0.0
 
     # Penalize ONLY extreme synthetic indicators
-    for k, w in weights.items():
+    for k, w in FORENSIC_WEIGHTS.items():
         if n[k] > 0.85:
             penalty += (n[k] - 0.85) * w * 2.5
 
-    # Optional debug (keep during testing)
-    print(" Digital Forensic Extraction")
-    for k, v in n.items():
-        print(k, round(v, 2))
+    return penalty
+
 
+def ai_flag_count(f):
     # ---- HARD AI RED FLAGS (Extended) ----
     ai_flags = 0
 
@@ -245,6 +753,10 @@ def interpret_forensics(f):
     if domain_failures >= 3:
         ai_flags += 2
 
+    return ai_flags
+
+
+def forensic_verdict(ai_flags, penalty):
     # ---- FINAL AI DECISION ----
     if ai_flags >= 7:
         confidence = round(min(0.25 + ai_flags * 0.03, 0.9), 2)
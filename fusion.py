@@ -1,5 +1,21 @@
 import numpy as np
 
+from metrics import STAGE_SECONDS, timed
+
+# Weighted fusion (LOW DEPENDENCY)
+FUSION_WEIGHTS = {
+    "metadata": 0.45,
+    "forensic": 0.35,
+    "ml": 0.20
+}
+
+# Final verdict thresholds (score >= threshold, checked in order)
+VERDICT_THRESHOLDS = [
+    (0.65, "REAL IMAGE"),
+    (0.45, "REAL BUT EDITED"),
+]
+FALLBACK_VERDICT = "AI-GENERATED"
+
 # ---------------- SCORE MAPPERS ----------------
 def map_metadata_score(meta_label, meta_conf):
     """
@@ -39,37 +55,74 @@ def map_ml_score(ml_label, ml_conf):
         return 0.0
 
 
+def map_scores(metadata_result, forensic_result, ml_result):
+    """
+    Maps the three module results to (metadata, forensic, ml) scores.
+    """
+    meta_label, meta_conf = metadata_result
+    forensic_label, forensic_conf = forensic_result
+
+    return (
+        map_metadata_score(meta_label, meta_conf),
+        map_forensic_score(forensic_label, forensic_conf),
+        map_ml_score(ml_result["label"], ml_result["confidence"])
+    )
+
+
+def verdict_for_score(final_score):
+    for threshold, verdict in VERDICT_THRESHOLDS:
+        if final_score >= threshold:
+            return verdict
+    return FALLBACK_VERDICT
+
+
 # ---------------- FUSION LOGIC ----------------
 def final_verdict_fusion(metadata_result, forensic_result, ml_result):
     """
     Combines metadata, forensic, and ML scores into a final verdict.
     Metadata is included but has reduced weight.
     """
-    meta_label, meta_conf = metadata_result
-    forensic_label, forensic_conf = forensic_result
-    ml_label = ml_result["label"]
-    ml_conf = ml_result["confidence"]
-
-    # Convert to normalized scores
-    metadata_score = map_metadata_score(meta_label, meta_conf)
-    forensic_score = map_forensic_score(forensic_label, forensic_conf)
-    ml_score = map_ml_score(ml_label, ml_conf)
-
-    # Weighted fusion (LOW DEPENDENCY)
-    final_score = (
-            0.45 * metadata_score +
-            0.35 * forensic_score +
-            0.20 * ml_score
+    with timed(STAGE_SECONDS, stage="fusion"):
+        # Convert to normalized scores
+        metadata_score, forensic_score, ml_score = map_scores(
+            metadata_result, forensic_result, ml_result
+        )
+
+        final_score = (
+                FUSION_WEIGHTS["metadata"] * metadata_score +
+                FUSION_WEIGHTS["forensic"] * forensic_score +
+                FUSION_WEIGHTS["ml"] * ml_score
+        )
+
+        final_score = float(np.clip(final_score, 0.0, 1.0))
+
+        return verdict_for_score(final_score), round(final_score, 2)
+
+
+def final_verdict_fusion_batch(metadata_scores, forensic_scores, ml_scores):
+    """
+    Vectorized fusion over arrays of already mapped module scores
+    (see map_scores). Returns (verdicts, final_scores) as arrays.
+    """
+    with timed(STAGE_SECONDS, stage="fusion"):
+        return _fuse_batch(metadata_scores, forensic_scores, ml_scores)
+
+
+def _fuse_batch(metadata_scores, forensic_scores, ml_scores):
+    final_scores = (
+            FUSION_WEIGHTS["metadata"] * np.asarray(metadata_scores, dtype=np.float64) +
+            FUSION_WEIGHTS["forensic"] * np.asarray(forensic_scores, dtype=np.float64) +
+            FUSION_WEIGHTS["ml"] * np.asarray(ml_scores, dtype=np.float64)
     )
+    final_scores = np.clip(final_scores, 0.0, 1.0)
 
-    final_score = float(np.clip(final_score, 0.0, 1.0))
+    verdicts = np.select(
+        [final_scores >= t for t, _ in VERDICT_THRESHOLDS],
+        [v for _, v in VERDICT_THRESHOLDS],
+        default=FALLBACK_VERDICT
+    )
 
-    # Final verdict thresholds
-    if final_score >= 0.65:
-        verdict = "REAL IMAGE"
-    elif final_score >= 0.45:
-        verdict = "REAL BUT EDITED"
-    else:
-        verdict = "AI-GENERATED"
+    # Python's round() keeps the batch scores identical to the single path
+    rounded = np.array([round(s, 2) for s in final_scores.tolist()])
 
-    return verdict, round(final_score, 2)
+    return verdicts, rounded
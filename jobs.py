@@ -0,0 +1,464 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from multiprocessing import get_context
+
+from log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# ---------------- JOB QUEUE CONFIG (env overridable) ----------------
+JOBS_DB_PATH = os.environ.get("TRUEFRAME_JOBS_DB", "jobs.db")
+JOBS_SPOOL_DIR = os.environ.get("TRUEFRAME_JOBS_SPOOL", "job_spool")
+JOB_LEASE_SECONDS = float(os.environ.get("TRUEFRAME_JOB_LEASE", 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get("TRUEFRAME_JOB_MAX_ATTEMPTS", 3))
+JOB_CLAIM_SIZE = int(os.environ.get("TRUEFRAME_JOB_CLAIM_SIZE", 8))
+JOB_POLL_SECONDS = float(os.environ.get("TRUEFRAME_JOB_POLL", 0.5))
+JOB_MAX_BACKOFF = float(os.environ.get("TRUEFRAME_JOB_MAX_BACKOFF", 30))
+JOB_RESPAWN_SECONDS = float(os.environ.get("TRUEFRAME_JOB_RESPAWN", 5))
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " id TEXT PRIMARY KEY,"
+    " created REAL NOT NULL,"
+    " finished REAL,"
+    " scale INTEGER NOT NULL,"
+    " cascade INTEGER NOT NULL,"
+    " total INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS items ("
+    " job_id TEXT NOT NULL,"
+    " idx INTEGER NOT NULL,"
+    " name TEXT,"
+    " path TEXT NOT NULL,"
+    " status TEXT NOT NULL,"          # pending | running | done | failed
+    " attempts INTEGER NOT NULL DEFAULT 0,"
+    " lease_until REAL,"
+    " worker TEXT,"
+    " result TEXT,"
+    " error TEXT,"
+    " PRIMARY KEY (job_id, idx))",
+    "CREATE INDEX IF NOT EXISTS items_status ON items (status, lease_until)"
+)
+
+
+# ---------------- STORE ----------------
+class JobStore:
+    """
+    SQLite-backed job queue shared by the API and any number of worker
+    processes (on the same host or a shared filesystem).
+
+    A job is a list of images; each image is an item with its own
+    status, attempt count and result. Uploaded bytes are spooled to
+    files, not stored in the database, and removed once the item is
+    finished. Workers lease items for JOB_LEASE_SECONDS; items of a
+    worker that died are picked up again when the lease runs out.
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH, spool_dir=JOBS_SPOOL_DIR):
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    @property
+    def _db(self):
+        # One connection per thread, opened on first use (constructing a
+        # store, e.g. when main.py is imported, touches no files). A
+        # shared connection would interleave the BEGIN / COMMIT of
+        # different API threads.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            # check_same_thread=False only so close() can close it
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self):
+        """Closes every thread's connection; later calls reconnect"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for connection in connections:
+            connection.close()
+
+    # -------- API side --------
+    def create_job(self, items, scale=1, cascade=False):
+        """Spools (name, bytes) items and queues them as one job; returns the job id"""
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir)
+
+        try:
+            rows = []
+            for idx, (name, data) in enumerate(items):
+                path = os.path.join(job_dir, str(idx))
+                with open(path, "wb") as f:
+                    f.write(data)
+                rows.append((job_id, idx, name, path, "pending"))
+
+            with self._transaction():
+                self._db.execute(
+                    "INSERT INTO jobs (id, created, scale, cascade, total) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, time.time(), scale, int(cascade), len(rows))
+                )
+                self._db.executemany(
+                    "INSERT INTO items (job_id, idx, name, path, status) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                if not rows:
+                    self._db.execute("UPDATE jobs SET finished = created WHERE id = ?", (job_id,))
+        except BaseException:
+            # Nothing references the spooled files unless the insert committed
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return job_id
+
+    def job_status(self, job_id):
+        job = self._db.execute(
+            "SELECT created, finished, scale, cascade, total FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if job is None:
+            return None
+        created, finished, scale, cascade, total = job
+
+        counts = dict(self._db.execute(
+            "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall())
+        completed = counts.get("done", 0) + counts.get("failed", 0)
+
+        if completed == total:
+            status = "done"
+        elif counts.get("running") or completed:
+            status = "running"
+        else:
+            status = "queued"
+
+        return {
+            "id": job_id,
+            "status": status,
+            "total": total,
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "running": counts.get("running", 0),
+            "pending": counts.get("pending", 0),
+            "progress": round(completed / total, 4) if total else 1.0,
+            "scale": scale,
+            "cascade": bool(cascade),
+            "created": created,
+            "finished": finished
+        }
+
+    def results(self, job_id, offset=0, limit=100):
+        """One page of per-image entries in submission order"""
+        total = self._db.execute("SELECT total FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if total is None:
+            return None
+
+        rows = self._db.execute(
+            "SELECT idx, name, status, attempts, result, error FROM items"
+            " WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?",
+            (job_id, limit, offset)
+        ).fetchall()
+
+        entries = []
+        for idx, name, status, attempts, result, error in rows:
+            entry = {"index": idx, "image": name, "status": status, "attempts": attempts}
+            if result is not None:
+                entry.update(json.loads(result))
+            if error is not None:
+                entry["error"] = error
+            entries.append(entry)
+
+        next_offset = offset + len(rows)
+        return {
+            "id": job_id,
+            "offset": offset,
+            "limit": limit,
+            "total": total[0],
+            "next_offset": next_offset if next_offset < total[0] else None,
+            "results": entries
+        }
+
+    def delete_job(self, job_id):
+        with self._transaction():
+            deleted = self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+            self._db.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+        shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+        return bool(deleted)
+
+    # -------- worker side --------
+    def claim(self, worker, limit=JOB_CLAIM_SIZE):
+        """
+        Leases up to `limit` items of the oldest job with work left.
+        Returns (job settings, [(idx, name, path), ...]); (None, []) when idle.
+        Expired leases that already used every attempt are failed here.
+        """
+        now = time.time()
+        with self._transaction():
+            self._db.execute(
+                "UPDATE items SET status = 'failed', error = 'worker lost (lease expired)',"
+                " lease_until = NULL WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, JOB_MAX_ATTEMPTS)
+            )
+            self._db.execute(
+                "UPDATE jobs SET finished = ? WHERE finished IS NULL AND NOT EXISTS"
+                " (SELECT 1 FROM items WHERE job_id = jobs.id AND status IN ('pending', 'running'))",
+                (now,)
+            )
+            claimable = (
+                "(status = 'pending' OR (status = 'running' AND lease_until < ?))"
+            )
+            row = self._db.execute(
+                f"SELECT items.job_id, scale, cascade FROM items JOIN jobs ON jobs.id = items.job_id"
+                f" WHERE {claimable} ORDER BY jobs.created, items.idx LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None, []
+            job_id, scale, cascade = row
+
+            items = self._db.execute(
+                f"SELECT idx, name, path FROM items WHERE job_id = ? AND {claimable}"
+                " ORDER BY idx LIMIT ?",
+                (job_id, now, limit)
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE items SET status = 'running', attempts = attempts + 1,"
+                " lease_until = ?, worker = ? WHERE job_id = ? AND idx = ?",
+                [(now + JOB_LEASE_SECONDS, worker, job_id, idx) for idx, _, _ in items]
+            )
+
+        return {"job_id": job_id, "scale": scale, "cascade": bool(cascade)}, items
+
+    def finish(self, job_id, outcomes):
+        """
+        Records {idx: (result, error, retryable)} for leased items.
+        Retryable errors go back to the queue until JOB_MAX_ATTEMPTS.
+        """
+        done_paths = []
+        with self._transaction():
+            for idx, (result, error, retryable) in outcomes.items():
+                row = self._db.execute(
+                    "SELECT attempts, path FROM items WHERE job_id = ? AND idx = ? AND status = 'running'",
+                    (job_id, idx)
+                ).fetchone()
+                if row is None:
+                    continue        # job deleted meanwhile
+                attempts, path = row
+
+                if error is None:
+                    status, encoded = "done", json.dumps(result)
+                elif retryable and attempts < JOB_MAX_ATTEMPTS:
+                    status, encoded = "pending", None
+                else:
+                    status, encoded = "failed", None
+
+                self._db.execute(
+                    "UPDATE items SET status = ?, result = ?, error = ?, lease_until = NULL"
+                    " WHERE job_id = ? AND idx = ?",
+                    (status, encoded, error, job_id, idx)
+                )
+                if status != "pending":
+                    done_paths.append(path)
+
+            left = self._db.execute(
+                "SELECT COUNT(*) FROM items WHERE job_id = ? AND status IN ('pending', 'running')",
+                (job_id,)
+            ).fetchone()[0]
+            if left == 0:
+                self._db.execute(
+                    "UPDATE jobs SET finished = ? WHERE id = ? AND finished IS NULL",
+                    (time.time(), job_id)
+                )
+
+        for path in done_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if left == 0:
+            shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE takes the write lock up front, so two workers never
+    # lease the same items
+    def __init__(self, db):
+        self._db = db
+
+    def __enter__(self):
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+# ---------------- WORKER ----------------
+def process_items(items, scale=1, cascade=False):
+    """
+    Analyzes leased (idx, name, path) items with one batched forest call.
+    Returns {idx: (result, error, retryable)}; undecodable images fail
+    for good, unexpected exceptions are retried.
+    """
+    from analyzer import analyze_images
+    from cascade import analyze_images_cascade
+    from context import ImageAnalysisContext
+    from near_duplicate import analyze_with_reuse
+
+    analyze = analyze_images_cascade if cascade else analyze_images
+    outcomes, contexts = {}, []
+
+    for idx, name, path in items:
+        try:
+            with open(path, "rb") as f:
+                ctx = ImageAnalysisContext(f.read(), name=name, scale=scale)
+        except OSError as e:
+            outcomes[idx] = (None, f"spooled upload missing: {e}", False)
+            continue
+        if ctx.gray is None:
+            outcomes[idx] = (None, "could not decode image", False)
+        else:
+            contexts.append((idx, ctx))
+
+    try:
+        results = analyze_with_reuse([ctx for _, ctx in contexts], analyze, cascade)
+        for (idx, _), result in zip(contexts, results):
+            outcomes[idx] = (result, None, False)
+    except Exception:
+        # Isolate the failing image(s); the rest still complete
+        for idx, ctx in contexts:
+            try:
+                outcomes[idx] = (analyze([ctx])[0], None, False)
+            except Exception as e:
+                logger.exception("Analysis failed for %s", ctx.name)
+                outcomes[idx] = (None, f"{type(e).__name__}: {e}", True)
+
+    return outcomes
+
+
+def run_worker(db_path=JOBS_DB_PATH, spool_dir=JOBS_SPOOL_DIR, stop=None):
+    """
+    Worker process loop: claim, analyze, persist; until stop is set.
+    A failing iteration (locked database, full disk, ...) is logged and
+    retried with exponential backoff; its claimed items are picked up
+    again once their lease expires.
+    """
+    from model_registry import get_registry
+
+    configure_logging()
+    get_registry().warm_up()
+
+    store = JobStore(db_path, spool_dir)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("Job worker %s started", worker)
+
+    failures = 0
+    try:
+        while stop is None or not stop.is_set():
+            try:
+                job, items = store.claim(worker)
+                if not items:
+                    time.sleep(JOB_POLL_SECONDS)
+                    continue
+                outcomes = process_items(items, job["scale"], job["cascade"])
+                store.finish(job["job_id"], outcomes)
+                failures = 0
+            except Exception:
+                failures += 1
+                delay = min(JOB_POLL_SECONDS * 2 ** failures, JOB_MAX_BACKOFF)
+                logger.exception("Job worker %s failed; retrying in %.1f s", worker, delay)
+                if stop is None:
+                    time.sleep(delay)
+                else:
+                    stop.wait(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+
+class JobWorkers:
+    """
+    A set of run_worker processes (used by the API when it hosts workers
+    itself). A monitor thread replaces processes that die (OOM kill,
+    native crash) until stop() is called.
+    """
+
+    def __init__(self, processes, db_path=JOBS_DB_PATH, spool_dir=JOBS_SPOOL_DIR):
+        self._context = get_context("spawn")
+        self._args = (db_path, spool_dir)
+        self._stop = self._context.Event()
+        self._count = processes
+        self._processes = []
+        self._monitor = None
+
+    def _spawn(self):
+        process = self._context.Process(
+            target=run_worker, args=(*self._args, self._stop), daemon=True
+        )
+        process.start()
+        return process
+
+    def _watch(self):
+        while not self._stop.wait(JOB_RESPAWN_SECONDS):
+            for i, process in enumerate(self._processes):
+                if not process.is_alive() and not self._stop.is_set():
+                    logger.error(
+                        "Job worker pid %s exited with code %s; respawning",
+                        process.pid, process.exitcode
+                    )
+                    process.join()
+                    self._processes[i] = self._spawn()
+
+    def start(self):
+        self._processes = [self._spawn() for _ in range(self._count)]
+        self._monitor = threading.Thread(target=self._watch, name="job-workers", daemon=True)
+        self._monitor.start()
+
+    def stop(self, timeout=30):
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        for process in self._processes:
+            process.join(timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run job-queue worker processes")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--db", default=JOBS_DB_PATH)
+    parser.add_argument("--spool", default=JOBS_SPOOL_DIR)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    workers = JobWorkers(max(1, args.processes), args.db, args.spool)
+    workers.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        workers.stop()
+
+
+# Guard required: worker processes re-import this module on spawn
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import json
+import logging
+import os
+import time
+
+# ---------------- LOGGING CONFIG (env overridable) ----------------
+LOG_LEVEL = os.environ.get("TRUEFRAME_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("TRUEFRAME_LOG_FORMAT", "json").lower()   # json | text
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                  + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    Installs a single stderr handler on the root logger (idempotent).
+    Level and format default to TRUEFRAME_LOG_LEVEL / TRUEFRAME_LOG_FORMAT.
+    """
+    handler = logging.StreamHandler()
+    if (fmt or LOG_FORMAT) == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level or LOG_LEVEL)
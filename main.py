@@ -1,13 +1,56 @@
-from authenticity_checker import check_image_authenticity
-from predict import ml_predict
-from fusion import final_verdict_fusion
-from features import extract_metadata_features, metadata_presence_report
-from fastapi import FastAPI, UploadFile, File
+from features import SUPPORTED_SCALES
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-import tempfile
-from analyzer import analyze_image
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import List
+import argparse
+import asyncio
+import json
+import logging
+import os
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from worker_pool import AnalysisPool, PoolBusyError, UndecodableImageError, analyze_upload, WORKERS
+from scan import IMAGE_EXTENSIONS, scan_batch
+from result_cache import ResultCache
+from jobs import JobStore, JobWorkers
+from log_config import configure_logging
+import metrics
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+pool = AnalysisPool()
+cache = ResultCache()
+jobs = JobStore()
+
+# Reduced-resolution fast mode for real-time traffic (1 = full resolution)
+DEFAULT_SCALE = int(os.environ.get("TRUEFRAME_FAST_SCALE", 1))
+
+# Early-exit cascade: skip later stages once the verdict is settled
+DEFAULT_CASCADE = os.environ.get("TRUEFRAME_CASCADE", "0").lower() in ("1", "true", "yes")
+
+# Batch uploads: max worker jobs one request may have in flight
+BATCH_CONCURRENCY = int(os.environ.get("TRUEFRAME_BATCH_CONCURRENCY", WORKERS))
+
+# Job-queue workers hosted by the API process; set 0 when the worker
+# tier runs separately (`python jobs.py --processes N`)
+JOB_WORKERS = int(os.environ.get("TRUEFRAME_JOB_WORKERS", 1))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Workers start (and load the model) before the first request arrives
+    configure_logging()
+    pool.start()
+    job_workers = JobWorkers(JOB_WORKERS)
+    job_workers.start()
+    yield
+    job_workers.stop()
+    pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,43 +59,268 @@ app.add_middleware(
    allow_headers=["*"],
 )
 
+def _cache_lookup(data, scale, cascade):
+    # Blocking (sha256 of the upload, SQLite tier): run via asyncio.to_thread
+    key = cache.key_for(data, f"scale={scale}", f"cascade={int(cascade)}")
+    return key, cache.get(key)
+
+
 @app.post("/analyze")
-async def analyze(file: UploadFile = File(...)):
-    with tempfile.NamedTemporaryFile(delete=False) as temp:
-        temp.write(await file.read())
-        temp_path = temp.name
+async def analyze(
+    file: UploadFile = File(...),
+    scale: int = Query(DEFAULT_SCALE, description="decode at 1/scale (1, 2, 4 or 8)"),
+    cascade: bool = Query(DEFAULT_CASCADE, description="stop at the first decisive stage")
+):
+    if scale not in SUPPORTED_SCALES:
+        raise HTTPException(status_code=422, detail=f"scale must be one of {SUPPORTED_SCALES}")
+
+    data = await file.read()
+
+    # Repeated uploads are answered from the cache without decoding.
+    # Hashing and the SQLite tier block, so both run in a thread.
+    key, cached = await asyncio.to_thread(_cache_lookup, data, scale, cascade)
+    if cached is not None:
+        return cached
+
+    try:
+        result = await pool.submit(analyze_upload, data, file.filename, scale, cascade)
+    except PoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except UndecodableImageError as e:
+        raise HTTPException(status_code=422, detail=f"{file.filename}: {e}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Analysis timed out")
+    except BrokenProcessPool:
+        raise HTTPException(status_code=503, detail="Analysis worker crashed; retry the request")
 
-    result = analyze_image(temp_path)
+    await asyncio.to_thread(cache.put, key, result)
     return result
 
 
-# ---------------- IMAGE PATH ----------------
-img_path = r"C:\Users\Rakshith\PycharmProjects\MiniProject2\test_folder\IMG_20241123_212959.jpg"
+# ---------------- BATCH UPLOADS ----------------
+def _iter_upload(upload):
+    """(name, bytes) of a plain image upload, or of every image in a zip upload"""
+    f = upload.file
+    if zipfile.is_zipfile(f):
+        f.seek(0)
+        with zipfile.ZipFile(f) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS:
+                    yield f"{upload.filename}!{info.filename}", archive.read(info)
+    else:
+        f.seek(0)
+        yield upload.filename, f.read()
 
-# ---------------- METADATA EXTRACTION ----------------
-metadata = extract_metadata_features(img_path)
-metadata_presence = metadata_presence_report(metadata)
 
-print("\nEXTRACTED METADATA FEATURES:")
-for feature, present in metadata_presence.items():
-    status = "Present" if present else "Missing"
-    print(f"  {feature}: {status}")
+def _chunks(files, chunk_size):
+    chunk = []
+    for upload in files:
+        for item in _iter_upload(upload):
+            chunk.append(item)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
 
-# ---------------- EXPERT-RULE ANALYSIS ----------------
-metadata_result, forensic_result = check_image_authenticity(img_path)
 
-# ---------------- FORENSIC-ONLY ML PREDICTION ----------------
-ml_result = ml_predict(img_path)
+def _lookup_chunk(chunk, scale, cascade):
+    # Hashing and the cache lookup (SQLite tier included) are blocking;
+    # called through asyncio.to_thread
+    hits, misses, keys = [], [], []
+    for name, data in chunk:
+        key, cached = _cache_lookup(data, scale, cascade)
+        if cached is not None:
+            hits.append({"image": name, **cached})
+        else:
+            misses.append((name, data))
+            keys.append(key)
+    return hits, misses, keys
 
-# ---------------- FINAL FUSION ----------------
-verdict, score = final_verdict_fusion(
-    metadata_result,
-    forensic_result,
-    ml_result
-)
 
-# ---------------- DISPLAY RESULTS ----------------
-print(f"""
+def _store_records(records, keys):
+    for record, key in zip(records, keys):
+        if "error" not in record:
+            cache.put(key, {k: v for k, v in record.items() if k != "image"})
+
+
+async def _analyze_chunk(chunk, keys, scale, cascade):
+    # Worker job for one chunk (one forest call); waits for a free pool
+    # slot instead of failing the whole stream
+    try:
+        records = await pool.submit(scan_batch, chunk, scale, cascade, wait=True)
+    except asyncio.TimeoutError:
+        return [{"image": name, "error": "Analysis timed out"} for name, _ in chunk]
+    except BrokenProcessPool:
+        return [{"image": name, "error": "Analysis worker crashed"} for name, _ in chunk]
+
+    await asyncio.to_thread(_store_records, records, keys)
+    return records
+
+
+async def _stream_batch(files, scale, cascade, chunk_size, concurrency):
+    """
+    Yields one NDJSON line per image as results arrive. Uploads (and zip
+    members) are read chunk by chunk, and at most `concurrency` chunks
+    of this request are queued or running at once. Reading, unzipping,
+    hashing and cache lookups run in threads, off the event loop.
+    A chunk that fails unexpectedly yields error lines for its images;
+    the rest of the stream carries on.
+    """
+    in_flight = {}      # task -> image names of its chunk
+    chunks = _chunks(files, chunk_size)
+
+    def lines(tasks):
+        out = []
+        for task in tasks:
+            names = in_flight.pop(task)
+            try:
+                records = task.result()
+            except Exception as e:
+                logger.exception("Batch chunk failed")
+                records = [{"image": name, "error": f"{type(e).__name__}: {e}"} for name in names]
+            out.extend(json.dumps(r) + "\n" for r in records)
+        return "".join(out)
+
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        hits, misses, keys = await asyncio.to_thread(_lookup_chunk, chunk, scale, cascade)
+
+        if hits:
+            yield "".join(json.dumps(r) + "\n" for r in hits)
+        if not misses:
+            continue
+
+        while len(in_flight) >= concurrency:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            yield lines(done)
+
+        task = asyncio.create_task(_analyze_chunk(misses, keys, scale, cascade))
+        in_flight[task] = [name for name, _ in misses]
+
+    while in_flight:
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        yield lines(done)
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(..., description="images and/or .zip archives of images"),
+    scale: int = Query(DEFAULT_SCALE, description="decode at 1/scale (1, 2, 4 or 8)"),
+    cascade: bool = Query(DEFAULT_CASCADE, description="stop at the first decisive stage"),
+    chunk_size: int = Query(8, ge=1, le=64, description="images per worker job"),
+    concurrency: int = Query(BATCH_CONCURRENCY, ge=1, description="max jobs in flight for this request")
+):
+    """
+    Analyzes many images in one request and streams newline-delimited
+    JSON back, one {"image": name, ...result} line per image in
+    completion order. Undecodable or failed images get an "error" line.
+    """
+    if scale not in SUPPORTED_SCALES:
+        raise HTTPException(status_code=422, detail=f"scale must be one of {SUPPORTED_SCALES}")
+
+    return StreamingResponse(
+        _stream_batch(files, scale, cascade, chunk_size, min(concurrency, BATCH_CONCURRENCY)),
+        media_type="application/x-ndjson"
+    )
+
+
+# ---------------- JOB QUEUE ----------------
+@app.post("/jobs", status_code=202)
+def submit_job(
+    files: List[UploadFile] = File(..., description="images and/or .zip archives of images"),
+    scale: int = Query(DEFAULT_SCALE, description="decode at 1/scale (1, 2, 4 or 8)"),
+    cascade: bool = Query(DEFAULT_CASCADE, description="stop at the first decisive stage")
+):
+    """
+    Queues a large submission and returns at once with the job id.
+    Poll GET /jobs/{id} for progress and page through GET /jobs/{id}/results.
+    """
+    if scale not in SUPPORTED_SCALES:
+        raise HTTPException(status_code=422, detail=f"scale must be one of {SUPPORTED_SCALES}")
+
+    items = (item for upload in files for item in _iter_upload(upload))
+    job_id = jobs.create_job(items, scale, cascade)
+    return jobs.job_status(job_id)
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    status = jobs.job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return status
+
+
+@app.get("/jobs/{job_id}/results")
+def job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Per-image entries in submission order; unfinished ones carry only their status"""
+    page = jobs.results(job_id, offset, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return page
+
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    if not jobs.delete_job(job_id):
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"deleted": job_id}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    # Stage timings recorded in the workers are merged in as jobs finish
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ---------------- COMMAND-LINE DEMO ----------------
+def demo(img_path):
+    """Analyzes one image in-process and prints every stage's verdict"""
+    from authenticity_checker import check_image_authenticity
+    from context import ImageAnalysisContext
+    from features import metadata_presence_report
+    from fusion import final_verdict_fusion
+    from predict import ml_predict
+
+    # Decode once; every stage below reuses this context
+    ctx = ImageAnalysisContext.from_path(img_path)
+
+    # ---------------- METADATA EXTRACTION ----------------
+    metadata = ctx.metadata
+    metadata_presence = metadata_presence_report(metadata)
+
+    print("\nEXTRACTED METADATA FEATURES:")
+    for feature, present in metadata_presence.items():
+        status = "Present" if present else "Missing"
+        print(f"  {feature}: {status}")
+
+    # ---------------- EXPERT-RULE ANALYSIS ----------------
+    metadata_result, forensic_result = check_image_authenticity(ctx)
+
+    # ---------------- FORENSIC-ONLY ML PREDICTION ----------------
+    ml_result = ml_predict(ctx)
+
+    # ---------------- FINAL FUSION ----------------
+    verdict, score = final_verdict_fusion(
+        metadata_result,
+        forensic_result,
+        ml_result
+    )
+
+    # ---------------- DISPLAY RESULTS ----------------
+    print(f"""
 -----------------------------------
 IMAGE: {img_path}
 
@@ -73,3 +341,10 @@ FINAL VERDICT: {verdict}
 FINAL CONFIDENCE SCORE: {score}
 -----------------------------------
 """)
+
+
+# Importing this module (uvicorn main:app) only builds the app
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze one image and print the verdicts")
+    parser.add_argument("image", help="path to the image")
+    demo(parser.parse_args().image)
@@ -0,0 +1,176 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# ---------------- METRIC TYPES ----------------
+# Latency buckets in seconds (0.5 ms .. 10 s)
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class _Metric:
+    """Base for a named metric with optional labels"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}    # label values tuple -> sample(s)
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def drain(self):
+        """Returns the samples recorded since the last drain and resets them"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (Prometheus semantics)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                key = tuple(key)
+                own, own_total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+                self._values[key] = ([a + b for a, b in zip(own, counts)], own_total + total)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._label_text(key, [('le', _number(bound))])} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{self._label_text(key, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Last-value gauge; merging keeps the most recent value"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def merge(self, values):
+        with self._lock:
+            for key, value in values.items():
+                self._values[tuple(key)] = value
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in items]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+# ---------------- REGISTRY ----------------
+REGISTRY = {}
+
+STAGE_SECONDS = Histogram(
+    "trueframe_stage_seconds",
+    "Time spent in each analysis stage",
+    labelnames=("stage",)
+)
+FEATURE_SECONDS = Histogram(
+    "trueframe_feature_seconds",
+    "Time spent computing each forensic feature",
+    labelnames=("feature",)
+)
+IMAGE_PIXELS = Gauge(
+    "trueframe_image_pixels",
+    "Pixel count of the most recently decoded image"
+)
+QUEUE_DEPTH = Gauge(
+    "trueframe_queue_depth",
+    "Analysis jobs queued or running in the worker pool"
+)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observes the wall time of the with-block in histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def drain():
+    """
+    Snapshot of every sample recorded in this process since the last
+    drain, as plain picklable data. Worker processes return this with
+    each job so the parent can merge() it into the registry it serves.
+    """
+    return {
+        name: values
+        for name, values in ((name, metric.drain()) for name, metric in REGISTRY.items())
+        if values
+    }
+
+
+def merge(snapshot):
+    for name, values in snapshot.items():
+        metric = REGISTRY.get(name)
+        if metric is not None:
+            metric.merge(values)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,13 @@
-from sklearn.ensemble import RandomForestClassifier
+import json
+import os
 import pickle
+import struct
+import tempfile
+from contextlib import contextmanager
+
 import numpy as np
+from features import to_full_resolution
+from metrics import STAGE_SECONDS, timed
 
 FEATURE_ORDER = [
     "noise", "edge", "sharpness", "jpeg",
@@ -8,38 +15,51 @@ FEATURE_ORDER = [
     "clipping", "entropy"
 ]
 
+CLASS_LABELS = ["Real", "Edited", "AI"]
+
+# Production forest configuration (train_model keyword overrides win)
+FOREST_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 12,
+    "min_samples_leaf": 5,
+    "class_weight": "balanced",
+    "random_state": 42
+}
+
 # ---------------- FORENSIC NORMALIZATION ----------------
-def normalize_forensics(features: dict) -> list:
+def normalize_forensics(features: dict, scale: int = 1) -> list:
     """
     Normalizes the 8 forensic features for ML input.
+    Features from a reduced-scale (fast mode) decode pass their scale.
     """
     for key in FEATURE_ORDER:
         if key not in features:
             raise ValueError(f"Missing feature: {key}")
 
-    return [
-        features["noise"] / 30.0,
-        features["edge"] * 5.0,
-        np.log1p(features["sharpness"]) / 8.0,
-        features["jpeg"] / 20.0,
-        features["cfa"] * 10.0,
-        features["noise_inconsistency"] * 10.0,
-        features["clipping"] * 10.0,
-        features["entropy"] / 8.0
-    ]
+    with timed(STAGE_SECONDS, stage="normalization"):
+        features = to_full_resolution(features, scale)
+
+        return [
+            features["noise"] / 30.0,
+            features["edge"] * 5.0,
+            np.log1p(features["sharpness"]) / 8.0,
+            features["jpeg"] / 20.0,
+            features["cfa"] * 10.0,
+            features["noise_inconsistency"] * 10.0,
+            features["clipping"] * 10.0,
+            features["entropy"] / 8.0
+        ]
 
 # ---------------- ML MODEL ----------------
-def train_model(X, y):
+def train_model(X, y, **params):
     """
     Trains a RandomForestClassifier using forensic-only features.
+    params override FOREST_PARAMS (e.g. n_estimators, max_depth).
     """
-    model = RandomForestClassifier(
-        n_estimators=300,
-        max_depth=12,
-        min_samples_leaf=5,
-        class_weight="balanced",
-        random_state=42
-    )
+    # Imported here: serving the flat .forest model never needs sklearn
+    from sklearn.ensemble import RandomForestClassifier
+
+    model = RandomForestClassifier(**{**FOREST_PARAMS, **params})
     model.fit(X, y)
     return model
 
@@ -48,16 +68,221 @@ def predict_image(model, feature_vector):
     Predicts the class label and confidence for a single feature vector.
     Assumes feature_vector is forensic-only (8 features).
     """
-    probs = model.predict_proba([feature_vector])[0]
-    labels = ["Real", "Edited", "AI"]
+    with timed(STAGE_SECONDS, stage="forest"):
+        probs = model.predict_proba([feature_vector])[0]
     idx = int(np.argmax(probs))
-    return labels[idx], round(float(probs[idx]), 2)
+    return CLASS_LABELS[idx], round(float(probs[idx]), 2)
+
+def predict_images(model, matrix):
+    """
+    Predicts class labels and confidences for many feature vectors
+    (one row per image) with a single predict_proba call.
+    Returns a list of (label, confidence) tuples in row order.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if len(matrix) == 0:
+        return []
+
+    with timed(STAGE_SECONDS, stage="forest"):
+        probs = model.predict_proba(matrix)
+    idx = np.argmax(probs, axis=1)
+    best = probs[np.arange(len(idx)), idx]
+
+    return [
+        (CLASS_LABELS[i], round(float(p), 2))
+        for i, p in zip(idx.tolist(), best.tolist())
+    ]
 
 # ---------------- MODEL IO ----------------
+@contextmanager
+def atomic_write(path):
+    """
+    Binary file handle whose contents replace path only once the block
+    succeeds. The old file is never truncated, so a FlatForest (or
+    np.load mmap) still mapping it keeps reading intact pages.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
 def save_model(model, path="trained_model.pkl"):
-    with open(path, "wb") as f:
+    with atomic_write(path) as f:
         pickle.dump(model, f)
 
 def load_model(path="trained_model.pkl"):
+    if str(path).endswith(FOREST_SUFFIX):
+        return FlatForest(path)
+
     with open(path, "rb") as f:
         return pickle.load(f)
+
+# ---------------- FLAT FOREST FORMAT ----------------
+# Layout: MAGIC | uint64 header length | JSON header | 64-byte aligned arrays.
+# All trees are concatenated into one global node table; children[2*i]
+# and children[2*i + 1] are node i's left/right child, and leaves point
+# to themselves with threshold +inf, so traversal needs no leaf masks.
+FOREST_MAGIC = b"TFFOREST"
+FOREST_SUFFIX = ".forest"
+_ALIGN = 64
+_CHUNK_ROWS = 1024
+
+
+def export_forest(model, path="trained_model.forest"):
+    """
+    Flattens a fitted RandomForestClassifier into a single binary file
+    that FlatForest can memory-map. No pickle involved. The file is
+    swapped in whole, so readers of the previous one are unaffected.
+    """
+    trees = [est.tree_ for est in model.estimators_]
+
+    offsets = np.cumsum([0] + [t.node_count for t in trees])
+    n_nodes = int(offsets[-1])
+    n_classes = len(model.classes_)
+
+    roots = offsets[:-1].astype(np.intp)
+    children = np.empty((n_nodes, 2), dtype=np.intp)
+    feature = np.empty(n_nodes, dtype=np.intp)
+    threshold = np.empty(n_nodes, dtype=np.float64)
+    missing_right = np.zeros(n_nodes, dtype=np.bool_)
+    value = np.empty((n_nodes, n_classes), dtype=np.float64)
+
+    for t, start in zip(trees, roots):
+        idx = np.arange(start, start + t.node_count)
+        leaf = t.children_left == -1
+
+        children[idx, 0] = np.where(leaf, idx, t.children_left + start)
+        children[idx, 1] = np.where(leaf, idx, t.children_right + start)
+        feature[idx] = np.where(leaf, 0, t.feature)
+        threshold[idx] = np.where(leaf, np.inf, t.threshold)
+        if hasattr(t, "missing_go_to_left"):
+            missing_right[idx] = ~leaf & (t.missing_go_to_left == 0)
+
+        v = t.value[:, 0, :n_classes]
+        sums = v.sum(axis=1, keepdims=True)
+        # Older sklearn stores class counts instead of fractions
+        if not np.allclose(sums, 1.0):
+            v = v / np.where(sums == 0, 1, sums)
+        value[idx] = v
+
+    arrays = {
+        "roots": roots,
+        "children": children,
+        "feature": feature,
+        "threshold": threshold,
+        "missing_right": missing_right,
+        "value": value
+    }
+
+    header = {
+        "classes": model.classes_.tolist(),
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max(t.max_depth for t in trees)),
+        "arrays": {}
+    }
+
+    # Array offsets depend on the header size, so lay out against a
+    # generous fixed header slot
+    header_slot = _ALIGN * 64
+    cursor = header_slot
+    for name, arr in arrays.items():
+        header["arrays"][name] = {
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": cursor
+        }
+        cursor += -(-arr.nbytes // _ALIGN) * _ALIGN
+
+    encoded = json.dumps(header).encode()
+    prefix = FOREST_MAGIC + struct.pack("<Q", len(encoded)) + encoded
+    if len(prefix) > header_slot:
+        raise ValueError("Forest header too large")
+
+    with atomic_write(path) as f:
+        f.write(prefix.ljust(header_slot, b"\0"))
+        for name, arr in arrays.items():
+            f.seek(header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(cursor)
+
+
+class FlatForest:
+    """
+    Random Forest inference straight from a memory-mapped .forest file.
+
+    Processes that map the same file share one page-cache copy of the
+    trees, and loading is just reading the header. predict_proba matches
+    RandomForestClassifier.predict_proba exactly: inputs are compared in
+    float32 like sklearn's trees, and per-tree probabilities are summed
+    in tree order before dividing by the number of trees.
+    """
+
+    def __init__(self, path):
+        # path may also be an open binary file; the mapping then pins
+        # exactly that file even if its name is replaced later
+        self.path = getattr(path, "name", path)
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+
+        if bytes(self._map[:len(FOREST_MAGIC)]) != FOREST_MAGIC:
+            raise ValueError(f"{path} is not a flat forest file")
+
+        (header_len,) = struct.unpack("<Q", bytes(self._map[8:16]))
+        header = json.loads(bytes(self._map[16:16 + header_len]))
+
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            arr = np.frombuffer(self._map, dtype=dtype, count=count, offset=spec["offset"])
+            setattr(self, f"_{name}", arr.reshape(spec["shape"]))
+
+        self.classes_ = np.array(header["classes"])
+        self.n_features_in_ = header["n_features"]
+        self.n_estimators = len(self._roots)
+        self.max_depth = header["max_depth"]
+
+    def apply(self, X):
+        """Leaf node index (global) per sample and tree: shape (n, trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        n_samples = len(X)
+        flat_x = X.ravel()
+        children = self._children.ravel()
+
+        # Offset of each sample's row in flat_x, broadcast over trees
+        row_base = (np.arange(n_samples, dtype=np.intp) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self._roots, (n_samples, self.n_estimators)).copy()
+        has_missing = bool(np.isnan(flat_x).any())
+
+        for _ in range(self.max_depth):
+            x = flat_x.take(row_base + self._feature.take(nodes))
+            go_right = x > self._threshold.take(nodes)
+            if has_missing:
+                # NaN follows the side sklearn learned for each node
+                missing = np.isnan(x)
+                go_right[missing] = self._missing_right.take(nodes[missing])
+            nodes = children.take(2 * nodes + go_right)
+
+        return nodes
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.zeros((len(X), len(self.classes_)))
+
+        # Row chunks keep the (rows, trees) node table cache-resident
+        for start in range(0, len(X), _CHUNK_ROWS):
+            leaves = self.apply(X[start:start + _CHUNK_ROWS])
+            out = proba[start:start + _CHUNK_ROWS]
+            for t in range(self.n_estimators):
+                out += self._value.take(leaves[:, t], axis=0)
+
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+from model import FOREST_SUFFIX, FlatForest
+
+logger = logging.getLogger(__name__)
+
+# The memory-mappable export is preferred when present: workers share
+# its pages and no pickle is loaded
+FLAT_MODEL_PATH = "trained_model.forest"
+PICKLE_MODEL_PATH = "trained_model.pkl"
+DEFAULT_MODEL_PATH = FLAT_MODEL_PATH if os.path.exists(FLAT_MODEL_PATH) else PICKLE_MODEL_PATH
+
+
+def file_fingerprint(path):
+    """SHA-256 of a file's contents (used as the model version)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_snapshot(path):
+    # Model, content hash and stat all come from one open file, so they
+    # agree even if a retrain replaces path meanwhile. Exports replace
+    # the file atomically; a FlatForest keeps mapping the old inode.
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if str(path).endswith(FOREST_SUFFIX):
+            model = FlatForest(f)
+            version = hashlib.sha256(model._map).hexdigest()
+        else:
+            data = f.read()
+            model = pickle.loads(data)
+            version = hashlib.sha256(data).hexdigest()
+    return model, version, (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+# ---------------- PROCESS-WIDE MODEL CACHE ----------------
+class ModelRegistry:
+    """
+    Keeps one trained model resident per process.
+
+    The model file is only loaded again when its inode/mtime/size
+    changes AND its content hash differs from the loaded one, so
+    touching the file or re-copying the same model does not trigger a
+    reload. A reload opens the new file and swaps the reference; the
+    old model's file is never written to, so in-flight predictions on
+    it finish normally.
+    If the file vanishes or cannot be read while a model is loaded (a
+    deploy mid-copy, an unmounted volume), the loaded model keeps
+    serving and a warning is logged; the check is retried on every call.
+    All access is guarded by a lock, so FastAPI worker threads can share
+    one registry.
+    """
+
+    def __init__(self, path=DEFAULT_MODEL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model = None
+        self._stat = None
+        self._version = None
+        self._file_stat_seen = None
+        self._file_version = None
+        self._stale_error = None
+
+    def _file_stat(self):
+        st = os.stat(self.path)
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _refresh(self):
+        # Caller must hold the lock
+        if self._model is None:
+            self._model, self._version, self._stat = _load_snapshot(self.path)
+            return
+
+        try:
+            if self._file_stat() == self._stat:
+                return
+            model, version, stat = _load_snapshot(self.path)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError) as e:
+            self._keep_stale(e)
+            return
+
+        self._stale_error = None
+        if version != self._version:
+            self._model, self._version = model, version
+        self._stat = stat
+
+    def _keep_stale(self, error):
+        # Warn once per distinct failure, not on every request
+        message = f"{type(error).__name__}: {error}"
+        if message != self._stale_error:
+            logger.warning(
+                "Cannot check model file %s (%s); keeping model %s",
+                self.path, message, (self._version or "")[:12]
+            )
+            self._stale_error = message
+
+    def get(self):
+        """Returns the resident model, reloading it if the file changed"""
+        with self._lock:
+            if self._model is not None and self.path is None:
+                return self._model
+            self._refresh()
+            return self._model
+
+    @property
+    def version(self):
+        """Content hash of the loaded model (None until loaded)"""
+        with self._lock:
+            return self._version
+
+    def file_version(self):
+        """
+        Content hash of the model file currently on disk, without loading
+        it (re-hashed only when mtime/size change). Lets processes that
+        never run inference, such as the API front-end, key caches on
+        the model version.
+        """
+        with self._lock:
+            if self.path is None:
+                return self._version
+            try:
+                stat = self._file_stat()
+                if stat != self._file_stat_seen:
+                    self._file_version = file_fingerprint(self.path)
+                    self._file_stat_seen = stat
+            except OSError as e:
+                if self._file_version is None:
+                    raise
+                self._keep_stale(e)
+            return self._file_version
+
+    def warm_up(self):
+        """
+        Loads the model and runs one dummy prediction so the first real
+        request after a deploy pays neither the load nor sklearn's
+        first-call overhead.
+        """
+        model = self.get()
+        n_features = getattr(model, "n_features_in_", 8)
+        model.predict_proba([[0.0] * n_features])
+        return model
+
+    def swap(self, model, version=None):
+        """
+        Hot-swaps an in-memory model (e.g. freshly trained) without
+        touching the file. The file watcher is disabled until reload().
+        """
+        with self._lock:
+            self._model = model
+            self._version = version or f"in-memory-{id(model):x}"
+            self._stat = None
+            self.path = None
+
+    def reload(self, path=None):
+        """Forces a reload, optionally switching to another model file"""
+        with self._lock:
+            if path is not None:
+                self.path = path
+            if self.path is None:
+                raise ValueError("No model path to reload from")
+            self._model = None
+            self._stat = None
+            self._refresh()
+            return self._model
+
+
+_registry = ModelRegistry(os.environ.get("TRUEFRAME_MODEL_PATH", DEFAULT_MODEL_PATH))
+
+
+def get_registry():
+    return _registry
+
+
+def get_model():
+    """Process-wide trained model (loaded once, reloaded on file change)"""
+    return _registry.get()
@@ -0,0 +1,209 @@
+import argparse
+import copy
+import json
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+from evaluate import single_latency, batch_latency
+from model import FOREST_PARAMS, train_model, export_forest, load_model
+
+DEFAULT_TREES = (25, 50, 100, 200, 300)
+DEFAULT_DEPTHS = (4, 6, 8, 10, 12, None)
+
+# Rows timed one at a time, rows per batch call, and best-of batch
+# repeats, per configuration
+SINGLE_LATENCY_ROWS = 200
+BATCH_ROWS = 256
+BATCH_REPEATS = 3
+
+
+# ---------------- FOREST SHRINKING ----------------
+def shrink_forest(model, n_trees):
+    """
+    The first n_trees trees of a fitted forest, as a forest of its own.
+    Tree seeds are drawn in sequence from random_state, so this is the
+    exact forest train_model(n_estimators=n_trees) would grow: one
+    training run per depth covers every tree count.
+    """
+    pruned = copy.copy(model)
+    pruned.estimators_ = model.estimators_[:n_trees]
+    pruned.n_estimators = n_trees
+    return pruned
+
+
+def _depth_label(depth):
+    return "none" if depth is None else str(depth)
+
+
+# ---------------- HELD-OUT ACCURACY ----------------
+def _fold_depth(X, y, train_idx, test_idx, depth, trees):
+    # Held-out predictions of every tree count at one depth on one fold
+    model = train_model(np.asarray(X[train_idx]), np.asarray(y[train_idx]),
+                        n_estimators=max(trees), max_depth=depth)
+    X_test = np.asarray(X[test_idx])
+    return depth, {n: shrink_forest(model, n).predict(X_test) for n in trees}, test_idx
+
+
+def held_out_accuracy(X, y, trees, depths, folds=5, n_jobs=-1, seed=42):
+    """{(n_trees, depth): out-of-fold accuracy} from stratified k-fold"""
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    splits = list(splitter.split(np.zeros(len(y)), y))
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fold_depth)(X, y, train_idx, test_idx, depth, trees)
+        for train_idx, test_idx in splits
+        for depth in depths
+    )
+
+    y = np.asarray(y)
+    correct = {}
+    for depth, predictions, test_idx in results:
+        for n, pred in predictions.items():
+            correct[n, depth] = correct.get((n, depth), 0) + int((pred == y[test_idx]).sum())
+    return {key: hits / len(y) for key, hits in correct.items()}
+
+
+# ---------------- LATENCY AND SIZE ----------------
+def measure_cost(X, y, trees, depths, seed=42):
+    """
+    Latency and size of every configuration, trained on all rows and
+    served the way the workers serve it: as a memory-mapped flat forest.
+    Runs sequentially so the timings do not compete for cores.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X)
+    probe = X[rng.integers(0, len(X), max(SINGLE_LATENCY_ROWS, BATCH_ROWS))]
+
+    costs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for depth in depths:
+            model = train_model(X, np.asarray(y), n_estimators=max(trees), max_depth=depth)
+            for n in trees:
+                pruned = shrink_forest(model, n)
+                path = os.path.join(tmp, f"t{n}_d{_depth_label(depth)}.forest")
+                export_forest(pruned, path)
+                flat = load_model(path)
+
+                costs[n, depth] = {
+                    "single_ms": single_latency(flat, probe, SINGLE_LATENCY_ROWS) * 1e3,
+                    "batch_ms": batch_latency(flat, probe[:BATCH_ROWS], BATCH_REPEATS) * 1e3,
+                    "forest_bytes": os.path.getsize(path),
+                    "pickle_bytes": len(pickle.dumps(pruned)),
+                    "nodes": int(sum(t.tree_.node_count for t in pruned.estimators_))
+                }
+                del flat
+    return costs
+
+
+# ---------------- PARETO FRONTIER ----------------
+def pareto_frontier(rows, latency_key):
+    """Rows no other row beats on both accuracy and latency, fastest first"""
+    frontier, best = [], -1.0
+    for row in sorted(rows, key=lambda r: (r[latency_key], -r["accuracy"])):
+        if row["accuracy"] > best:
+            frontier.append(row)
+            best = row["accuracy"]
+    return frontier
+
+
+def pick_for_budgets(frontier, budgets_ms, latency_key):
+    """Most accurate frontier configuration within each latency budget"""
+    picks = {}
+    for budget in budgets_ms:
+        fitting = [r for r in frontier if r[latency_key] <= budget]
+        picks[str(budget)] = fitting[-1] if fitting else None
+    return picks
+
+
+def _parse_depth(value):
+    return None if value.lower() == "none" else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Accuracy vs latency vs size across forest sizes and depths"
+    )
+    parser.add_argument("--X", default="X_train.npy", help="feature matrix (.npy)")
+    parser.add_argument("--y", default="y_train.npy", help="labels (.npy)")
+    parser.add_argument("--trees", type=int, nargs="+", default=list(DEFAULT_TREES))
+    parser.add_argument("--depths", type=_parse_depth, nargs="+", default=list(DEFAULT_DEPTHS),
+                        help="max_depth values ('none' = unlimited)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel trainings (-1 = all cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", choices=("single", "batch"), default="single",
+                        help="latency used for the frontier (per image)")
+    parser.add_argument("--budget-ms", type=float, nargs="*", default=[],
+                        help="per-image latency budgets to pick a model for")
+    parser.add_argument("--export", metavar="DIR",
+                        help="write every frontier model as DIR/forest_t<trees>_d<depth>.forest")
+    parser.add_argument("--out", default="model_sizing.json")
+    args = parser.parse_args()
+
+    X = np.load(args.X, mmap_mode="r")
+    y = np.load(args.y, mmap_mode="r")
+    trees = sorted(set(args.trees))
+    latency_key = f"{args.latency}_ms"
+
+    start = time.perf_counter()
+    accuracy = held_out_accuracy(X, y, trees, args.depths, args.folds, args.jobs, args.seed)
+    costs = measure_cost(X, y, trees, args.depths, args.seed)
+
+    rows = [
+        {"trees": n, "max_depth": depth, "accuracy": accuracy[n, depth], **costs[n, depth]}
+        for depth in args.depths for n in trees
+    ]
+    frontier = pareto_frontier(rows, latency_key)
+    on_frontier = {(r["trees"], r["max_depth"]) for r in frontier}
+
+    production = (FOREST_PARAMS["n_estimators"], FOREST_PARAMS["max_depth"])
+    print(f"\n{'trees':>5} {'depth':>5} {'accuracy':>8} {'single ms':>10} {'batch ms':>9} "
+          f"{'forest KB':>9} {'pickle KB':>9}")
+    for r in rows:
+        mark = "*" if (r["trees"], r["max_depth"]) in on_frontier else " "
+        mark += " (production)" if (r["trees"], r["max_depth"]) == production else ""
+        print(f"{r['trees']:5} {_depth_label(r['max_depth']):>5} {r['accuracy']:8.3f} "
+              f"{r['single_ms']:10.4f} {r['batch_ms']:9.5f} {r['forest_bytes'] / 1024:9.1f} "
+              f"{r['pickle_bytes'] / 1024:9.1f} {mark}")
+    print(f"\n* = Pareto frontier on accuracy vs {args.latency}-image latency")
+
+    picks = pick_for_budgets(frontier, args.budget_ms, latency_key)
+    for budget, pick in picks.items():
+        choice = f"{pick['trees']} trees, depth {_depth_label(pick['max_depth'])} " \
+                 f"(accuracy {pick['accuracy']:.3f})" if pick else "nothing fits"
+        print(f"Budget {budget} ms: {choice}")
+
+    if args.export:
+        os.makedirs(args.export, exist_ok=True)
+        for depth in {r["max_depth"] for r in frontier}:
+            model = train_model(np.asarray(X), np.asarray(y), n_estimators=max(trees), max_depth=depth)
+            for r in frontier:
+                if r["max_depth"] == depth:
+                    path = os.path.join(args.export, f"forest_t{r['trees']}_d{_depth_label(depth)}.forest")
+                    export_forest(shrink_forest(model, r["trees"]), path)
+                    print("Wrote", path)
+
+    report = {
+        "folds": args.folds,
+        "samples": int(len(y)),
+        "latency": args.latency,
+        "grid": rows,
+        "frontier": frontier,
+        "budgets": picks,
+        "seconds": time.perf_counter() - start
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.out} ({report['seconds']:.1f} s)")
+
+
+# Guard required: joblib worker processes re-import this module
+if __name__ == "__main__":
+    main()
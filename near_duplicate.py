@@ -0,0 +1,309 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from authenticity_checker import metadata_verdict
+from cascade import is_decisive
+from feature_store import encode_features, decode_features
+from fusion import final_verdict_fusion
+from result_cache import pipeline_version
+
+logger = logging.getLogger(__name__)
+
+# ---------------- NEAR-DUPLICATE CONFIG (env overridable) ----------------
+NEARDUP_ENABLED = os.environ.get("TRUEFRAME_NEARDUP", "0").lower() in ("1", "true", "yes")
+# Shared SQLite file so every worker process sees every entry ("" = in-process only)
+NEARDUP_DB_PATH = os.environ.get("TRUEFRAME_NEARDUP_DB", "")
+# Max Hamming distance (out of 64 bits) for two images to count as copies
+NEARDUP_MAX_DISTANCE = int(os.environ.get("TRUEFRAME_NEARDUP_DISTANCE", 5))
+# Re-fused score must stay this far from a verdict threshold to be reused
+NEARDUP_MARGIN = float(os.environ.get("TRUEFRAME_NEARDUP_MARGIN", 0.05))
+# Newest entries kept per process (and in the SQLite file); older ones are evicted
+NEARDUP_MAX_ENTRIES = int(os.environ.get("TRUEFRAME_NEARDUP_MAX_ENTRIES", 20000))
+
+# Hashes with fewer set (or clear) bits than this come from flat or
+# plain-gradient images, which all hash alike; they are never matched
+MIN_MINORITY_BITS = 4
+
+
+# ---------------- BK-TREE ----------------
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def _informative(key, bits=64):
+    ones = key.bit_count()
+    return min(ones, bits - ones) >= MIN_MINORITY_BITS
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance"""
+
+    def __init__(self):
+        self._root = None       # [hash, values, {distance: child}]
+        self.size = 0
+
+    def add(self, key, value):
+        self.size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+
+        node = self._root
+        while True:
+            d = hamming(key, node[0])
+            if d == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """[(distance, value), ...] within radius, nearest first"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(key, node[0])
+            if d <= radius:
+                found.extend((d, value) for value in node[1])
+            # Triangle inequality: only children at d +- radius can match
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+# ---------------- INDEX ----------------
+class NearDuplicateIndex:
+    """
+    dHash index of analyzed images and their forensic + ML results.
+
+    A new upload whose hash is within max_distance of a stored image
+    (same decode scale and pipeline_version) reuses that image's
+    forensic features, forensic verdict and forest prediction; only the
+    cheap metadata stage runs on the new bytes, and the three are fused
+    again. The reuse is skipped when the re-fused score lies within
+    margin of a verdict threshold, since re-encoding shifts the forensic
+    features slightly.
+
+    Only the newest max_entries images are kept (age-based eviction).
+    With a db_path, entries live in SQLite and each process keeps a
+    BK-tree of the newest rows, topped up incrementally with rows added
+    by the other workers; the stored feature dicts stay in SQLite and
+    are read only on a hit.
+    """
+
+    def __init__(self, db_path=NEARDUP_DB_PATH, max_distance=NEARDUP_MAX_DISTANCE,
+                 margin=NEARDUP_MARGIN, max_entries=NEARDUP_MAX_ENTRIES):
+        self.max_distance = max_distance
+        self.margin = margin
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        self._entries = OrderedDict()   # id -> (hash, entry), oldest first
+        self._version = None
+        self._last_id = 0
+        self._db = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " hash TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " scale INTEGER NOT NULL,"
+                " name TEXT,"
+                " features TEXT,"
+                " forensic TEXT NOT NULL,"
+                " ml TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def lookup(self, ctx, cascade=False):
+        """Result for ctx re-fused from its nearest stored copy, or None"""
+        if ctx.gray is None or not _informative(ctx.dhash):
+            return None
+
+        key = ctx.dhash
+        with self._lock:
+            self._sync()
+            matches = [
+                (d, entry) for d, entry in self._tree.search(key, self.max_distance)
+                if entry["scale"] == ctx.scale
+            ]
+            if not matches:
+                self.misses += 1
+                return None
+
+        distance, entry = matches[0]
+        metadata_result = metadata_verdict(ctx.metadata)
+        verdict, score = final_verdict_fusion(metadata_result, entry["forensic"], entry["ml"])
+        decisive = is_decisive((score, score), self.margin)
+
+        with self._lock:
+            if not decisive:
+                self.misses += 1
+                return None
+            self.hits += 1
+            features = self._features(entry)
+
+        logger.debug("Near-duplicate of %s (distance %d)", entry["name"], distance,
+                     extra={"image": ctx.name})
+        if features is not None:
+            ctx.__dict__["forensic"] = features
+
+        result = {
+            "metadata": metadata_result,
+            "forensic": entry["forensic"],
+            "ml": entry["ml"],
+            "final_verdict": verdict,
+            "confidence": score
+        }
+        if cascade:
+            result["decided_at"] = "near_duplicate"
+            result["confidence_range"] = [score, score]
+        result["near_duplicate"] = {"of": entry["name"], "distance": distance}
+        return result
+
+    def add(self, ctx, result):
+        """Indexes an analyzed context; early-exit results without ML are skipped"""
+        if ctx.gray is None or result.get("forensic") is None or result.get("ml") is None:
+            return
+        if "near_duplicate" in result or not _informative(ctx.dhash):
+            return
+
+        entry = {
+            "scale": ctx.scale,
+            "name": ctx.name,
+            # Only stored if the forensic stage actually ran on this context
+            "features": vars(ctx).get("forensic"),
+            "forensic": tuple(result["forensic"]),
+            "ml": result["ml"]
+        }
+        key = ctx.dhash
+
+        with self._lock:
+            self._sync()
+            if self._db is None:
+                self._last_id += 1
+                self._insert(self._last_id, key, entry)
+                return
+            row_id = self._db.execute(
+                "INSERT INTO entries (hash, version, scale, name, features, forensic, ml)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (f"{key:016x}", self._version, entry["scale"], entry["name"],
+                 encode_features(entry["features"]), json.dumps(entry["forensic"]),
+                 json.dumps(entry["ml"]))
+            ).lastrowid
+            # The file keeps the same newest-max_entries window as the trees
+            self._db.execute("DELETE FROM entries WHERE id <= ?", (row_id - self.max_entries,))
+            self._db.commit()
+            self._sync()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _features(self, entry):
+        # Caller must hold the lock. SQLite-backed entries load the
+        # feature dict on demand (None once the row has been evicted).
+        if self._db is None:
+            return entry["features"]
+        row = self._db.execute("SELECT features FROM entries WHERE id = ?", (entry["id"],)).fetchone()
+        return decode_features(row[0]) if row is not None else None
+
+    def _insert(self, entry_id, key, entry):
+        # Caller must hold the lock. A BK-tree cannot delete, so once
+        # over the cap the oldest tenth is dropped and the tree rebuilt;
+        # the rebuild cost is spread over that many inserts.
+        self._entries[entry_id] = (key, entry)
+        self._tree.add(key, entry)
+        if len(self._entries) <= self.max_entries:
+            return
+
+        keep = self.max_entries - max(1, self.max_entries // 10)
+        while len(self._entries) > keep:
+            self._entries.popitem(last=False)
+        self._tree = BKTree()
+        for key, entry in self._entries.values():
+            self._tree.add(key, entry)
+
+    def _sync(self):
+        # Caller must hold the lock. A new pipeline version drops every
+        # entry; otherwise rows written by other processes are loaded,
+        # starting from the newest max_entries on the first call.
+        version = pipeline_version()
+        if version != self._version:
+            self._tree = BKTree()
+            self._entries.clear()
+            self._version = version
+            self._last_id = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries WHERE version != ?", (version,))
+                self._db.commit()
+
+        if self._db is None:
+            return
+        if self._last_id == 0:
+            newest = self._db.execute("SELECT MAX(id) FROM entries").fetchone()[0] or 0
+            self._last_id = max(0, newest - self.max_entries)
+
+        rows = self._db.execute(
+            "SELECT id, hash, scale, name, forensic, ml FROM entries"
+            " WHERE id > ? AND version = ? ORDER BY id",
+            (self._last_id, version)
+        ).fetchall()
+        for row_id, key, scale, name, forensic, ml in rows:
+            self._insert(row_id, int(key, 16), {
+                "id": row_id,
+                "scale": scale,
+                "name": name,
+                "forensic": tuple(json.loads(forensic)),
+                "ml": json.loads(ml)
+            })
+            self._last_id = row_id
+
+
+_index = None
+
+
+def get_index():
+    """Process-wide index, or None when TRUEFRAME_NEARDUP is off"""
+    global _index
+    if NEARDUP_ENABLED and _index is None:
+        _index = NearDuplicateIndex()
+    return _index
+
+
+def analyze_with_reuse(contexts, analyze, cascade=False):
+    """
+    Runs analyze (analyze_images or analyze_images_cascade) on the
+    contexts that have no near-duplicate in the index, in one call,
+    and indexes their results. Returns one result per context, in order.
+    """
+    index = get_index()
+    if index is None:
+        return analyze(contexts)
+
+    results = [index.lookup(ctx, cascade) for ctx in contexts]
+    misses = [i for i, result in enumerate(results) if result is None]
+
+    if misses:
+        for i, result in zip(misses, analyze([contexts[i] for i in misses])):
+            results[i] = result
+            index.add(contexts[i], result)
+
+    return results
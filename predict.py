@@ -1,14 +1,19 @@
-from features import extract_advanced_forensic_features
-from model import normalize_forensics, load_model, predict_image
+import numpy as np
 
-def ml_predict(image_path):
+from model import normalize_forensics, predict_image, predict_images
+from model_registry import get_model
+from context import as_context
+
+def ml_predict(image):
     """
     Predicts image authenticity using only forensic features.
     Metadata features are removed for ML prediction.
+    Accepts an image path or an ImageAnalysisContext.
     """
-    model = load_model("trained_model.pkl")
+    model = get_model()
 
-    forensic = extract_advanced_forensic_features(image_path)
+    ctx = as_context(image)
+    forensic = ctx.forensic
     if forensic is None:
         return {
             "label": "Unknown",
@@ -16,7 +21,7 @@ def ml_predict(image_path):
         }
 
     # ---------------- FORENSIC-ONLY FEATURE VECTOR ----------------
-    feature_vector = normalize_forensics(forensic)
+    feature_vector = normalize_forensics(forensic, scale=ctx.scale)
 
     label, confidence = predict_image(model, feature_vector)
 
@@ -24,3 +29,32 @@ def ml_predict(image_path):
         "label": label,
         "confidence": confidence
     }
+
+
+def ml_predict_batch(images):
+    """
+    Batch counterpart of ml_predict for many paths / contexts.
+    Feature vectors are stacked into one matrix and classified with a
+    single predict_proba call. Returns one result dict per input, in order.
+    """
+    contexts = [as_context(image) for image in images]
+
+    results = [{"label": "Unknown", "confidence": 0.0} for _ in contexts]
+    rows, vectors = [], []
+
+    for i, ctx in enumerate(contexts):
+        forensic = ctx.forensic
+        if forensic is None:
+            continue
+        rows.append(i)
+        vectors.append(normalize_forensics(forensic, scale=ctx.scale))
+
+    if vectors:
+        predictions = predict_images(get_model(), np.array(vectors))
+        for i, (label, confidence) in zip(rows, predictions):
+            results[i] = {
+                "label": label,
+                "confidence": confidence
+            }
+
+    return results
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from fusion import FUSION_WEIGHTS, VERDICT_THRESHOLDS, FALLBACK_VERDICT
+from features import load_scale_calibration
+from model_registry import get_registry
+
+# ---------------- CACHE CONFIG (env overridable) ----------------
+CACHE_MAX_BYTES = int(float(os.environ.get("TRUEFRAME_CACHE_MB", 64)) * 1024 * 1024)
+CACHE_DB_PATH = os.environ.get("TRUEFRAME_CACHE_DB", "")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def fusion_version():
+    """Hash of the fusion weights, thresholds and fast-mode calibration"""
+    config = json.dumps(
+        [FUSION_WEIGHTS, VERDICT_THRESHOLDS, FALLBACK_VERDICT, load_scale_calibration()],
+        sort_keys=True
+    )
+    return hashlib.sha256(config.encode()).hexdigest()[:16]
+
+
+def pipeline_version():
+    """
+    Version of everything that can change a verdict for the same bytes:
+    the trained model file and the fusion / calibration configuration.
+    """
+    model_version = (get_registry().file_version() or "none")[:16]
+    return f"{model_version}-{fusion_version()}"
+
+
+# ---------------- RESULT CACHE ----------------
+class ResultCache:
+    """
+    Two-tier cache of analysis results keyed by upload content hash.
+
+    Tier 1 is an in-memory LRU bounded by the (JSON) size of the stored
+    results. Tier 2 is an optional SQLite file that survives restarts.
+    Every key embeds pipeline_version(), so retraining the model or
+    changing the fusion weights makes old entries unreachable; stale rows
+    in SQLite are purged when a new version is first seen.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, db_path=CACHE_DB_PATH):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (result, size)
+        self._size = 0
+        self._db = None
+        self._purged_version = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " version TEXT NOT NULL,"
+                " result TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def key_for(self, data, *extra):
+        """Cache key for raw upload bytes (plus any extra request options)"""
+        version = pipeline_version()
+        self._purge_stale(version)
+        parts = [content_hash(data), version, *map(str, extra)]
+        return ":".join(parts)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT result FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result, len(row[0]))
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        encoded = json.dumps(result)
+        with self._lock:
+            self._remember(key, result, len(encoded))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, version, result) VALUES (?, ?, ?)",
+                    (key, key.split(":")[1], encoded)
+                )
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def _remember(self, key, result, size):
+        # Caller must hold the lock
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (result, size)
+        self._size += size
+
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    def _purge_stale(self, version):
+        if self._db is None or version == self._purged_version:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM results WHERE version != ?", (version,))
+            self._db.commit()
+            self._purged_version = version
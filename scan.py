@@ -0,0 +1,393 @@
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import tarfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from analyzer import analyze_images
+from cascade import analyze_images_cascade
+from context import ImageAnalysisContext
+from features import SUPPORTED_SCALES
+from log_config import configure_logging
+from near_duplicate import analyze_with_reuse
+from worker_pool import init_worker
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff", ".heic", ".heif"
+}
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tgz", ".tar.gz", ".tar.bz2", ".tar.xz")
+
+CSV_FIELDS = [
+    "image", "final_verdict", "confidence",
+    "metadata_label", "metadata_confidence",
+    "forensic_label", "forensic_confidence",
+    "ml_label", "ml_confidence", "decided_at", "error"
+]
+
+# Runs of a batch whose worker died; later runs go one image per job,
+# so an image that kills its worker only fails itself
+SCAN_MAX_ATTEMPTS = 2
+
+# Raised by corrupt, truncated, encrypted or unreadable archives / members
+ARCHIVE_ERRORS = (
+    zipfile.BadZipFile, zipfile.LargeZipFile, tarfile.TarError, zlib.error,
+    EOFError, OSError, NotImplementedError, RuntimeError
+)
+
+
+class UnreadableInput(Exception):
+    """Passed in place of the bytes of an input that could not be read"""
+
+
+def _is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _is_archive(path):
+    try:
+        return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+    except OSError:
+        return False
+
+
+def _unreadable(name, error):
+    logger.warning("Cannot read %s: %s", name, error)
+    return UnreadableInput(f"could not read archive: {type(error).__name__}: {error}")
+
+
+# ---------------- INPUT DISCOVERY ----------------
+def iter_archive(path):
+    """
+    Yields (name, bytes) for every image inside a .zip / .tar(.gz|.bz2|.xz).
+    A member, or the whole archive, that cannot be read yields an
+    UnreadableInput in place of the bytes, so it becomes an error record
+    instead of aborting the scan.
+    """
+    try:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and _is_image(info.filename):
+                        name = f"{path}!{info.filename}"
+                        try:
+                            data = archive.read(info)
+                        except ARCHIVE_ERRORS as e:
+                            data = _unreadable(name, e)
+                        yield name, data
+            return
+
+        with tarfile.open(path, "r:*") as archive:
+            for member in archive:
+                if member.isfile() and _is_image(member.name):
+                    name = f"{path}!{member.name}"
+                    try:
+                        f = archive.extractfile(member)
+                        data = f.read() if f is not None else None
+                    except ARCHIVE_ERRORS as e:
+                        data = _unreadable(name, e)
+                    if data is not None:
+                        yield name, data
+    except ARCHIVE_ERRORS as e:
+        # Could not open (or, for tar, keep walking) the archive itself
+        yield path, _unreadable(path, e)
+
+
+def iter_inputs(inputs):
+    """
+    Expands directories, glob patterns, archives and plain files into a
+    stream of work items. Plain files are passed by path (workers read
+    them); archive members are read here and passed as bytes.
+    """
+    for spec in inputs:
+        if os.path.isdir(spec):
+            for root, dirs, files in os.walk(spec):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if _is_image(name):
+                        yield path, None
+                    elif name.lower().endswith(ARCHIVE_EXTENSIONS):
+                        yield from iter_archive(path)
+        elif os.path.isfile(spec):
+            if _is_image(spec):
+                yield spec, None
+            elif spec.lower().endswith(ARCHIVE_EXTENSIONS) or _is_archive(spec):
+                yield from iter_archive(spec)
+            else:
+                logger.warning("Skipping unsupported input %s", spec)
+        else:
+            matches = sorted(glob.glob(spec, recursive=True))
+            if not matches:
+                logger.warning("No files match %s", spec)
+            yield from iter_inputs(matches)
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------------- WORKER ----------------
+def scan_batch(items, scale=1, cascade=False):
+    """
+    Worker job: analyzes one batch (single forest call for the batch).
+    Undecodable or failing images become error records instead of
+    aborting the batch.
+    """
+    analyze = analyze_images_cascade if cascade else analyze_images
+    records, contexts = [], []
+
+    for name, data in items:
+        if isinstance(data, UnreadableInput):
+            records.append({"image": name, "error": str(data)})
+            continue
+        if data is None:
+            ctx = ImageAnalysisContext.from_path(name, scale=scale)
+        else:
+            ctx = ImageAnalysisContext(data, name=name, scale=scale)
+        if ctx.gray is None:
+            records.append({"image": name, "error": "could not decode image"})
+        else:
+            contexts.append(ctx)
+
+    try:
+        results = analyze_with_reuse(contexts, analyze, cascade)
+    except Exception:
+        # Fall back to one-by-one so a single bad image is isolated
+        results = []
+        for ctx in contexts:
+            try:
+                results.extend(analyze([ctx]))
+            except Exception as e:
+                results.append({"error": f"{type(e).__name__}: {e}"})
+
+    for ctx, result in zip(contexts, results):
+        records.append({"image": ctx.name, **result})
+
+    return records
+
+
+# ---------------- OUTPUT ----------------
+def _csv_row(record):
+    row = {"image": record["image"], "error": record.get("error", "")}
+    if "final_verdict" in record:
+        row.update({
+            "final_verdict": record["final_verdict"],
+            "confidence": record["confidence"],
+            "metadata_label": record["metadata"][0],
+            "metadata_confidence": record["metadata"][1],
+            "decided_at": record.get("decided_at", "")
+        })
+    # Stages skipped by the cascade are None and left empty
+    if record.get("forensic"):
+        row["forensic_label"], row["forensic_confidence"] = record["forensic"]
+    if record.get("ml"):
+        row["ml_label"] = record["ml"]["label"]
+        row["ml_confidence"] = record["ml"]["confidence"]
+    return row
+
+
+def load_completed(output, fmt):
+    """
+    Names already present in a partial output file (for --resume).
+    A trailing half-written line from an interrupted run is dropped.
+    Error records do not count, so failed images are retried.
+    """
+    if not os.path.exists(output):
+        return set()
+
+    with open(output, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    done = set()
+    with open(output, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                if not row.get("error"):
+                    done.add(row["image"])
+        else:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if "error" not in record:
+                        done.add(record["image"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return done
+
+
+class ResultWriter:
+    """Appends records as JSONL or CSV, flushing after every batch"""
+
+    def __init__(self, output, fmt, append):
+        self.fmt = fmt
+        new_file = not (append and os.path.exists(output) and os.path.getsize(output) > 0)
+        self._file = open(output, "a" if append else "w", newline="", encoding="utf-8")
+
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS)
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self.fmt == "csv":
+                self._csv.writerow(_csv_row(record))
+            else:
+                self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# ---------------- PIPELINE ----------------
+def scan(inputs, output, fmt="jsonl", workers=None, batch_size=16, resume=False, scale=1,
+         cascade=False):
+    """
+    Streams every image found in inputs through a process pool and
+    writes one record per image as results arrive. At most two batches
+    per worker are in flight, so archives are never read fully into
+    memory. A worker crash restarts the pool and retries the batch one
+    image at a time; images that crash it again are written as errors.
+    Returns (processed, errors).
+    """
+    workers = workers or os.cpu_count() or 1
+    done = load_completed(output, fmt) if resume else set()
+    if done:
+        logger.info("Resuming: %d images already in %s", len(done), output)
+
+    items = ((name, data) for name, data in iter_inputs(inputs) if name not in done)
+    writer = ResultWriter(output, fmt, append=resume)
+
+    processed = errors = 0
+    start = last_report = time.time()
+
+    def report(final=False):
+        elapsed = max(time.time() - start, 1e-9)
+        end = "\n" if final else "\r"
+        print(
+            f"Processed {processed} images ({processed / elapsed:.1f}/s), {errors} errors",
+            end=end, file=sys.stderr, flush=True
+        )
+
+    def new_executor():
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+    def isolating(in_flight):
+        return any(attempt > 1 for _, _, attempt in in_flight.values())
+
+    executor = new_executor()
+    try:
+        in_flight = {}          # future -> (executor, batch, attempt)
+        retry = []              # (batch, attempt) to resubmit first
+        batches = _batches(items, batch_size)
+        exhausted = False
+
+        while in_flight or retry or not exhausted:
+            # Retries run alone, so a crash during one is that image's fault
+            while len(in_flight) < workers * 2 and not isolating(in_flight):
+                if retry:
+                    if in_flight:
+                        break
+                    batch, attempt = retry.pop()
+                elif exhausted:
+                    break
+                else:
+                    batch, attempt = next(batches, None), 1
+                    if batch is None:
+                        exhausted = True
+                        continue
+                try:
+                    future = executor.submit(scan_batch, batch, scale, cascade)
+                except BrokenProcessPool:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = new_executor()
+                    future = executor.submit(scan_batch, batch, scale, cascade)
+                in_flight[future] = (executor, batch, attempt)
+
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                owner, batch, attempt = in_flight.pop(future)
+                try:
+                    records = future.result()
+                except BrokenProcessPool:
+                    # A worker died (OOM kill, signal); every batch in
+                    # flight on that pool fails with it
+                    if owner is executor:
+                        logger.error("Scan worker died; restarting the process pool")
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = new_executor()
+                    if attempt < SCAN_MAX_ATTEMPTS:
+                        retry.extend(([item], attempt + 1) for item in batch)
+                        continue
+                    records = [
+                        {"image": name, "error": "worker crashed while analyzing this image"}
+                        for name, _ in batch
+                    ]
+                writer.write(records)
+                processed += len(records)
+                errors += sum("error" in r for r in records)
+
+            if time.time() - last_report >= 1.0:
+                report()
+                last_report = time.time()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+
+    report(final=True)
+    return processed, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scan directories, glob patterns or .zip/.tar archives of images"
+    )
+    parser.add_argument("inputs", nargs="+", help="directories, files, globs or archives")
+    parser.add_argument("-o", "--output", default="scan_results.jsonl",
+                        help="output file (default: scan_results.jsonl)")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="output format (default: from the output extension)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=16,
+                        help="images per worker job / forest call (default: 16)")
+    parser.add_argument("--scale", type=int, choices=SUPPORTED_SCALES, default=1,
+                        help="fast mode: decode at 1/scale resolution (default: 1)")
+    parser.add_argument("--cascade", action="store_true",
+                        help="stop each image at the first decisive stage (skips the forest when it cannot change the verdict)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip images already present in the output file and append")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    scan(args.inputs, args.output, fmt, args.workers, args.batch_size, args.resume, args.scale,
+         args.cascade)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from model import FOREST_PARAMS, FEATURE_ORDER, save_model, export_forest
+from model_registry import file_fingerprint
+
+# Forest hyperparameters searched (sampled uniformly from each list).
+# The normalize_forensics scaling constants are deliberately not part of
+# the space: each is a positive monotone per-feature transform, and
+# tree splits are invariant to those, so every setting yields the same
+# forest (checked: identical predict_proba under random rescaling).
+PARAM_SPACE = {
+    "n_estimators": [50, 100, 200, 300, 500],
+    "max_depth": [4, 6, 8, 10, 12, 16, None],
+    "min_samples_leaf": [1, 2, 3, 5, 8, 12],
+    "min_samples_split": [2, 4, 8],
+    "max_features": ["sqrt", "log2", 0.5, None],
+    "criterion": ["gini", "entropy"],
+    "class_weight": ["balanced", "balanced_subsample", None]
+}
+
+# Successive halving spends trees as its resource: each round keeps the
+# best third of the candidates and triples their trees. The starting
+# size is derived from the candidate count so that the final round
+# holds fewer than HALVING_FACTOR candidates and uses the largest
+# start * HALVING_FACTOR**k not above HALVING_MAX_TREES
+# (486 trees for 60 candidates, 498 for 6)
+HALVING_FACTOR = 3
+HALVING_MAX_TREES = 500
+
+
+def build_search(strategy, n_iter, folds, n_jobs, scoring, seed):
+    """sklearn search object over PARAM_SPACE (randomized or successive halving)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import StratifiedKFold
+
+    base = RandomForestClassifier(**FOREST_PARAMS)
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+
+    if strategy == "halving":
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingRandomSearchCV
+
+        space = {k: v for k, v in PARAM_SPACE.items() if k != "n_estimators"}
+        return HalvingRandomSearchCV(
+            base, space, n_candidates=n_iter, resource="n_estimators", factor=HALVING_FACTOR,
+            min_resources="exhaust", max_resources=HALVING_MAX_TREES, aggressive_elimination=True,
+            cv=cv, scoring=scoring, n_jobs=n_jobs, random_state=seed, refit=True
+        )
+
+    from sklearn.model_selection import RandomizedSearchCV
+
+    return RandomizedSearchCV(
+        base, PARAM_SPACE, n_iter=n_iter, cv=cv, scoring=scoring,
+        n_jobs=n_jobs, random_state=seed, refit=True
+    )
+
+
+def top_candidates(search, k=10):
+    # Halving ranks every round together; only the last round's
+    # candidates were scored with the final (largest) tree count
+    results = search.cv_results_
+    candidates = np.arange(len(results["params"]))
+    if "iter" in results:
+        candidates = candidates[results["iter"] == results["iter"].max()]
+    order = candidates[np.argsort(-results["mean_test_score"][candidates], kind="stable")][:k]
+    return [
+        {
+            "mean_score": float(results["mean_test_score"][i]),
+            "std_score": float(results["std_test_score"][i]),
+            "params": results["params"][i],
+            **({"n_resources": int(results["n_resources"][i])} if "n_resources" in results else {})
+        }
+        for i in order
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Hyperparameter search for the forensic Random Forest on the "
+                    "cached feature matrices (never decodes an image)"
+    )
+    parser.add_argument("--X", default="X_train.npy", help="feature matrix (.npy)")
+    parser.add_argument("--y", default="y_train.npy", help="labels (.npy)")
+    parser.add_argument("--strategy", choices=("random", "halving"), default="halving")
+    parser.add_argument("--iter", type=int, default=60, help="candidates to sample")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel fits (-1 = all cores)")
+    parser.add_argument("--scoring", default="balanced_accuracy")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="search_model",
+                        help="writes <output>.pkl, <output>.forest and <output>.json")
+    args = parser.parse_args()
+
+    # Memory-mapped: joblib hands the same mapping to every worker
+    X = np.load(args.X, mmap_mode="r")
+    y = np.load(args.y, mmap_mode="r")
+
+    smallest = int(np.unique(y, return_counts=True)[1].min())
+    if args.folds > smallest:
+        parser.error(f"--folds {args.folds} exceeds the smallest class size ({smallest})")
+
+    search = build_search(args.strategy, args.iter, args.folds, args.jobs, args.scoring, args.seed)
+
+    start = time.perf_counter()
+    search.fit(X, y)
+    seconds = time.perf_counter() - start
+
+    import sklearn
+
+    best = search.best_estimator_
+    best_params = {**FOREST_PARAMS, **search.best_params_, "n_estimators": best.n_estimators}
+    # Trees and surviving candidates per round (halving only); the
+    # cv_results_ rows count every round's evaluation of a candidate
+    rounds = [int(n) for n in getattr(search, "n_resources_", [])]
+    round_candidates = [int(n) for n in getattr(search, "n_candidates_", [])]
+    evaluations = len(search.cv_results_["params"])
+    candidates = round_candidates[0] if round_candidates else evaluations
+
+    save_model(best, f"{args.output}.pkl")
+    export_forest(best, f"{args.output}.forest")
+
+    metadata = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "strategy": args.strategy,
+        "scoring": args.scoring,
+        "folds": args.folds,
+        "seed": args.seed,
+        "candidates": candidates,
+        "evaluations": evaluations,
+        "best_score": float(search.best_score_),
+        "best_params": best_params,
+        "rounds": len(rounds),
+        "rounds_trees": rounds,
+        "rounds_candidates": round_candidates,
+        "production_params": FOREST_PARAMS,
+        "feature_order": FEATURE_ORDER,
+        "samples": int(len(y)),
+        "data": {
+            "X": {"path": args.X, "sha256": file_fingerprint(args.X)},
+            "y": {"path": args.y, "sha256": file_fingerprint(args.y)}
+        },
+        "sklearn_version": sklearn.__version__,
+        "search_seconds": seconds,
+        "top": top_candidates(search)
+    }
+    with open(f"{args.output}.json", "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+
+    print("\n========== SEARCH RESULT ==========")
+    print(f"Strategy / candidates : {args.strategy} / {metadata['candidates']} ({seconds:.1f} s)")
+    if rounds:
+        print(f"Rounds / evaluations  : {len(rounds)} / {evaluations}")
+        print(f"Candidates per round  : {' -> '.join(map(str, round_candidates))}")
+        print(f"Trees per round       : {' -> '.join(map(str, rounds))}")
+    print(f"Best {args.scoring:15}: {search.best_score_:.4f}")
+    for key, value in best_params.items():
+        print(f"  {key:18} : {value}")
+    print(f"\nSaved {args.output}.pkl, {args.output}.forest and {args.output}.json")
+    print(f"Serve it with TRUEFRAME_MODEL_PATH={args.output}.forest")
+
+
+# Guard required: joblib worker processes re-import this module
+if __name__ == "__main__":
+    main()
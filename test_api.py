@@ -0,0 +1,66 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from worker_pool import AnalysisPool
+
+
+@pytest.fixture(scope="module")
+def client():
+    # One analysis worker, no job-queue workers
+    patch = pytest.MonkeyPatch()
+    patch.setattr(main, "pool", AnalysisPool(workers=1, max_pending=4))
+    patch.setattr(main, "JOB_WORKERS", 0)
+    with TestClient(main.app) as c:
+        yield c
+    patch.undo()
+
+
+def _jpeg(seed=0):
+    img = np.random.default_rng(seed).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+# ---------------- /analyze ----------------
+def test_analyze_image(client):
+    r = client.post("/analyze", files={"file": ("a.jpg", _jpeg())})
+    assert r.status_code == 200
+    assert "final_verdict" in r.json()
+
+
+@pytest.mark.parametrize("data", [b"", b"not an image"])
+def test_analyze_undecodable_is_422(client, data):
+    r = client.post("/analyze", files={"file": ("bad.jpg", data)})
+    assert r.status_code == 422
+    assert "could not decode image" in r.json()["detail"]
+
+
+# ---------------- /analyze/batch ----------------
+def _batch(client, n, **params):
+    files = [("files", (f"img{i}.jpg", _jpeg(i))) for i in range(n)]
+    r = client.post("/analyze/batch", files=files, params={"chunk_size": 2, **params})
+    assert r.status_code == 200
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+def test_batch_failed_chunk_yields_error_lines(client, monkeypatch):
+    # Storing results fails for one chunk only (e.g. a full disk)
+    store = main._store_records
+
+    def flaky_store(records, keys):
+        if any(r["image"] == "img2.jpg" for r in records):
+            raise OSError("No space left on device")
+        store(records, keys)
+
+    monkeypatch.setattr(main, "_store_records", flaky_store)
+    monkeypatch.setattr(main.cache, "get", lambda key: None)
+    records = {r["image"]: r for r in _batch(client, 5, scale=2)}
+    assert sorted(records) == [f"img{i}.jpg" for i in range(5)]
+    for name in ("img2.jpg", "img3.jpg"):
+        assert records[name]["error"] == "OSError: No space left on device"
+    for name in ("img0.jpg", "img1.jpg", "img4.jpg"):
+        assert "final_verdict" in records[name]
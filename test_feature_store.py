@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+import features
+from feature_store import FeatureStore, extract_file_features
+from features import extractor_version
+
+
+def _write_image(path):
+    img = np.random.default_rng(0).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+    cv2.imwrite(str(path), img)
+    return str(path)
+
+
+def test_hit_for_same_extractor(tmp_path):
+    path = _write_image(tmp_path / "a.jpg")
+    store = FeatureStore(str(tmp_path / "store.db"))
+    store.put(extract_file_features(path))
+
+    hit, cached = store.lookup(path)
+    assert hit
+    assert cached == features.extract_advanced_forensic_features(path)
+    store.close()
+
+
+def test_extractor_change_invalidates_row(tmp_path, monkeypatch):
+    path = _write_image(tmp_path / "a.jpg")
+    db = str(tmp_path / "store.db")
+    store = FeatureStore(db)
+    store.put(extract_file_features(path))
+    store.close()
+
+    # Another tile budget is another version
+    store = FeatureStore(db, version=extractor_version(memory_budget=1 << 20))
+    assert store.lookup(path) == (False, None)
+    store.close()
+
+    # So is any edit to features.py
+    monkeypatch.setattr(features, "_source_hash", "edited")
+    store = FeatureStore(db)
+    assert store.lookup(path) == (False, None)
+
+    # Re-extracting under the new version makes it a hit again
+    store.put(extract_file_features(path))
+    assert store.lookup(path)[0]
+    store.close()
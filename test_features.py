@@ -0,0 +1,145 @@
+import cv2
+import numpy as np
+import pytest
+
+import features
+from features import (
+    block_std, forensic_features_from_gray, global_forensic_stats,
+    _gray_histogram, _hist_global_stats
+)
+
+# The legacy code takes np.std of empty block lists on tiny images
+pytestmark = pytest.mark.filterwarnings("ignore::RuntimeWarning")
+
+# Odd, tiny, exactly-divisible and non-divisible shapes
+SHAPES = [(1, 1), (5, 7), (31, 33), (32, 32), (33, 65), (64, 96), (97, 161), (250, 100), (333, 517)]
+
+
+# ---------------- LEGACY REFERENCES ----------------
+# The per-pixel code these optimizations replaced, kept verbatim
+def legacy_block_std(img, size=32):
+    h, w = img.shape
+    blocks = []
+    for y in range(0, h - size, size):
+        for x in range(0, w - size, size):
+            blocks.append(np.std(img[y:y + size, x:x + size]))
+    return np.array(blocks)
+
+
+def legacy_forensic_features(img):
+    h, w = img.shape
+    h2, w2 = h - (h % 2), w - (w % 2)
+    img_even = img[:h2, :w2]
+
+    hist = cv2.calcHist([img], [0], None, [256], [0, 256])
+    hist /= hist.sum() + 1e-8
+
+    return {
+        "noise": np.std(img),
+        "edge": np.mean(cv2.Canny(img, 100, 200) > 0),
+        "sharpness": cv2.Laplacian(img, cv2.CV_64F).var(),
+        "jpeg": np.mean(np.abs(img[8:, :] - img[:-8, :])),
+        "cfa": np.std(img_even[::2, ::2].astype(np.float32) - img_even[1::2, 1::2].astype(np.float32)),
+        "noise_inconsistency": np.std(legacy_block_std(img)),
+        "clipping": np.mean((img <= 2) | (img >= 253)),
+        "entropy": -np.sum(hist * np.log2(hist + 1e-8))
+    }
+
+
+def _images(shape, seed=0):
+    # Uniform noise, a flat field, and a smooth image with clipped tails
+    rng = np.random.default_rng(seed)
+    yield rng.integers(0, 256, shape, dtype=np.uint8)
+    yield np.full(shape, rng.integers(256), dtype=np.uint8)
+    smooth = cv2.GaussianBlur(rng.integers(0, 256, shape, dtype=np.uint8).astype(np.float32), (0, 0), 3)
+    yield np.clip(smooth * 3 - 200 + rng.normal(0, 5, shape), 0, 255).astype(np.uint8)
+
+
+def _assert_close(expected, actual, rtol):
+    expected, actual = float(expected), float(actual)
+    if np.isnan(expected):
+        assert np.isnan(actual)
+    else:
+        assert actual == pytest.approx(expected, rel=rtol, abs=1e-12)
+
+
+# ---------------- BLOCK STD ----------------
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("size", [32, 7, 13])
+@pytest.mark.parametrize("block_rows", [16, 1, 3])
+def test_block_std_matches_loop(shape, size, block_rows):
+    for img in _images(shape):
+        expected = legacy_block_std(img, size)
+        actual = block_std(img, size, block_rows)
+        assert actual.shape == expected.shape
+        np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12)
+
+
+# ---------------- GLOBAL STATS (HISTOGRAM PASS) ----------------
+@pytest.mark.parametrize("shape", SHAPES)
+def test_histogram_stats_match_legacy(shape):
+    for img in _images(shape):
+        expected = legacy_forensic_features(img)
+        stats = _hist_global_stats(_gray_histogram(img), img.size)
+        _assert_close(expected["noise"], stats["noise"], 1e-12)
+        assert stats["clipping"] == expected["clipping"]
+        assert stats["entropy"] == expected["entropy"]
+
+
+def test_strip_histogram_matches_whole_image():
+    img = next(_images((700, 300)))
+    budget = 300 * features._BYTES_PER_PIXEL * 100
+    assert global_forensic_stats(img, memory_budget=budget) == global_forensic_stats(img, memory_budget=0)
+
+
+# ---------------- FULL EXTRACTION (SHARED SCRATCH BUFFER) ----------------
+# CFA is float32 in the legacy code too, so it only agrees to float32 rounding
+RTOL = {"cfa": 1e-6}
+
+
+@pytest.mark.parametrize("scratch_max", [features.SCRATCH_MAX_BYTES, 0])
+def test_forensic_features_match_legacy(monkeypatch, scratch_max):
+    # Large, small, then large again: later calls reuse a buffer that
+    # still holds the previous image's intermediates
+    monkeypatch.setattr(features, "SCRATCH_MAX_BYTES", scratch_max)
+    for shape in [(333, 517), (5, 7), (64, 96), (97, 161), (333, 517)]:
+        for img in _images(shape, seed=sum(shape)):
+            expected = legacy_forensic_features(img)
+            actual = forensic_features_from_gray(img, memory_budget=0)
+            assert actual.keys() == expected.keys()
+            for key in expected:
+                _assert_close(expected[key], actual[key], RTOL.get(key, 1e-12))
+
+
+# ---------------- TILED EXTRACTION ----------------
+# Welford / Chan moments merged across strips round differently from
+# the exact whole-image sums; CFA is float32 on both paths
+TILED_RTOL = {"sharpness": 1e-9, "cfa": 1e-6, "noise_inconsistency": 1e-12}
+
+
+@pytest.mark.parametrize("shape", [(97, 161), (250, 100), (333, 517), (64, 96), (31, 33)])
+@pytest.mark.parametrize("strip", [2, 8, 16, 32, 64, 96, 160])
+def test_tiled_matches_whole_image(monkeypatch, shape, strip):
+    # Strips below the 32-row halo included: every strip's window then
+    # reaches well past its neighbours
+    monkeypatch.setattr(features, "_strip_rows", lambda width, budget: strip)
+    for img in _images(shape, seed=strip):
+        expected = forensic_features_from_gray(img, memory_budget=0)
+        actual = features.forensic_features_tiled(img, memory_budget=1)
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert type(actual[key]) is type(expected[key]), key
+            _assert_close(expected[key], actual[key], TILED_RTOL.get(key, 1e-12))
+
+
+@pytest.mark.parametrize("shape", [(333, 517), (700, 301)])
+def test_tiled_dispatch_with_memory_budget(shape):
+    # Real budgets as forensic_features_from_gray picks the tiled path
+    img = next(_images(shape))
+    expected = forensic_features_from_gray(img, memory_budget=0)
+    for rows in (32, 64, 128):
+        budget = shape[1] * features._BYTES_PER_PIXEL * (rows + 2 * features._TILE_HALO)
+        assert features._strip_rows(shape[1], budget) == rows
+        actual = forensic_features_from_gray(img, memory_budget=budget)
+        for key in expected:
+            _assert_close(expected[key], actual[key], TILED_RTOL.get(key, 1e-12))
@@ -0,0 +1,48 @@
+import sqlite3
+import threading
+import time
+
+import jobs
+import model_registry
+
+
+class _Registry:
+    def warm_up(self):
+        pass
+
+
+def test_worker_survives_failing_iteration(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "get_registry", lambda: _Registry())
+    monkeypatch.setattr(jobs, "configure_logging", lambda: None)
+    monkeypatch.setattr(jobs, "JOB_POLL_SECONDS", 0.01)
+    stop = threading.Event()
+    calls = []
+
+    def claim(self, worker, limit=jobs.JOB_CLAIM_SIZE):
+        calls.append(worker)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        stop.set()
+        return None, []
+
+    monkeypatch.setattr(jobs.JobStore, "claim", claim)
+    jobs.run_worker(str(tmp_path / "jobs.db"), str(tmp_path / "spool"), stop)
+    assert len(calls) == 3
+
+
+def test_dead_worker_is_respawned(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RESPAWN_SECONDS", 0.1)
+    workers = jobs.JobWorkers(1, str(tmp_path / "jobs.db"), str(tmp_path / "spool"))
+    workers.start()
+    try:
+        first = workers._processes[0]
+        first.kill()
+        deadline = time.time() + 30
+        while workers._processes[0] is first and time.time() < deadline:
+            time.sleep(0.05)
+        replacement = workers._processes[0]
+        assert replacement is not first
+        assert replacement.is_alive() and replacement.pid != first.pid
+    finally:
+        workers.stop(timeout=10)
+    assert not any(p.is_alive() for p in workers._processes)
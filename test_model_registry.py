@@ -0,0 +1,41 @@
+import logging
+import pickle
+
+from model_registry import ModelRegistry
+
+
+class _Model:
+    def __init__(self, name):
+        self.name = name
+
+
+def _write(path, name):
+    path.write_bytes(pickle.dumps(_Model(name)))
+
+
+def test_keeps_serving_when_file_vanishes(tmp_path, caplog):
+    path = tmp_path / "model.pkl"
+    _write(path, "a")
+    registry = ModelRegistry(str(path))
+    version = registry.file_version()
+    assert registry.get().name == "a"
+
+    path.unlink()
+    with caplog.at_level(logging.WARNING, logger="model_registry"):
+        assert registry.get().name == "a"
+        assert registry.get().name == "a"
+        assert registry.file_version() == version
+    assert len(caplog.records) == 1
+
+    _write(path, "b")
+    assert registry.get().name == "b"
+
+
+def test_keeps_serving_when_file_is_truncated(tmp_path):
+    path = tmp_path / "model.pkl"
+    _write(path, "a")
+    registry = ModelRegistry(str(path))
+    assert registry.get().name == "a"
+
+    path.write_bytes(pickle.dumps(_Model("b"))[:10])
+    assert registry.get().name == "a"
@@ -0,0 +1,53 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+import scan
+
+
+def _write_images(folder, names):
+    img = np.zeros((8, 8, 3), dtype=np.uint8)
+    for name in names:
+        cv2.imwrite(str(folder / name), img)
+
+
+def _crashing_batch(items, scale=1, cascade=False):
+    # Kills the worker process outright, as the OOM killer would
+    if any(os.path.basename(name) == "crash.png" for name, _ in items):
+        os._exit(1)
+    return [{"image": name, "final_verdict": "REAL"} for name, _ in items]
+
+
+def test_load_completed_skips_errors(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text(
+        json.dumps({"image": "a.png", "final_verdict": "REAL"}) + "\n"
+        + json.dumps({"image": "b.png", "error": "could not decode image"}) + "\n"
+        + '{"image": "c.p'
+    )
+    assert scan.load_completed(str(out), "jsonl") == {"a.png"}
+
+    out = tmp_path / "out.csv"
+    out.write_text("image,error\na.png,\nb.png,could not decode image\n")
+    assert scan.load_completed(str(out), "csv") == {"a.png"}
+
+
+def test_worker_crash_is_isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan, "scan_batch", _crashing_batch)
+    monkeypatch.setattr(scan, "init_worker", lambda: None)
+    names = [f"img{i}.png" for i in range(6)] + ["crash.png"]
+    _write_images(tmp_path, names)
+    out = tmp_path / "out.jsonl"
+
+    processed, errors = scan.scan([str(tmp_path)], str(out), workers=2, batch_size=4)
+
+    records = {}
+    for line in out.read_text().splitlines():
+        record = json.loads(line)
+        records[os.path.basename(record["image"])] = record
+    assert processed == len(names) and errors == 1
+    assert set(records) == set(names)
+    assert "error" in records["crash.png"]
+    assert all("error" not in records[n] for n in names if n != "crash.png")
@@ -1,7 +1,10 @@
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from features import extract_advanced_forensic_features
-from model import normalize_forensics, train_model, save_model
+from feature_store import FeatureStore, DEFAULT_STORE_PATH, extract_file_features
+from model import normalize_forensics, train_model, save_model, export_forest, atomic_write
 
 DATASET_DIR = "dataset"
 
@@ -11,22 +14,76 @@ CLASS_MAP = {
     "ai": 2
 }
 
-X, y = [], []
-
-for class_name, label in CLASS_MAP.items():
-    folder = os.path.join(DATASET_DIR, class_name)
-
-    for img in os.listdir(folder):
-        img_path = os.path.join(folder, img)
 
-        forensic = extract_advanced_forensic_features(img_path)
+def list_dataset(dataset_dir=DATASET_DIR):
+    """(image_path, label) for every file under dataset/{real,edited,ai}"""
+    items = []
+    for class_name, label in CLASS_MAP.items():
+        folder = os.path.join(dataset_dir, class_name)
+
+        for img in sorted(os.listdir(folder)):
+            items.append((os.path.join(folder, img), label))
+    return items
+
+
+def extract_all(paths, store, workers):
+    """
+    Returns {path: forensic dict or None}. Images already in the feature
+    store (unchanged size/mtime or identical content) are not decoded
+    again; the rest are extracted across a process pool and persisted.
+    """
+    features, missing = {}, []
+
+    for path in paths:
+        hit, forensic = store.lookup(path)
+        if hit:
+            features[path] = forensic
+        else:
+            missing.append(path)
+
+    print(f"Feature store: {len(features)} cached, {len(missing)} to extract")
+
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(missing) // (workers * 8))
+            for done, record in enumerate(executor.map(extract_file_features, missing, chunksize=chunksize), 1):
+                store.put(record)
+                features[record["path"]] = record["features"]
+                if done % 100 == 0:
+                    store.commit()
+                    print(f"  extracted {done}/{len(missing)}")
+
+    store.commit()
+    return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the forensic Random Forest")
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH,
+                        help="feature store database (default: feature_store.db)")
+    args = parser.parse_args()
+
+    items = list_dataset(args.dataset)
+
+    store = FeatureStore(args.store)
+    try:
+        features = extract_all([path for path, _ in items], store, args.workers or 1)
+    finally:
+        store.close()
+
+    X, y = [], []
+
+    for img_path, label in items:
+        forensic = features[img_path]
         if forensic is None:
             continue
 
         feature_vector = normalize_forensics(forensic)
 
         # -------- DEBUG PRINT --------
-        #print(f"\nImage: {img}")
+        #print(f"\nImage: {img_path}")
         #for k, v in forensic.items():
          #   print(f"{k:22} : {v:.4f}")
         #print("Normalized Vector:", feature_vector)
@@ -34,33 +91,42 @@ for class_name, label in CLASS_MAP.items():
         X.append(feature_vector)
         y.append(label)
 
-X = np.array(X)
-y = np.array(y)
+    X = np.array(X)
+    y = np.array(y)
+
+
+    # -------- DATA SUMMARY --------
+    print("\n========== TRAINING DATA SUMMARY ==========")
+    print(f"Total samples      : {len(X)}")
+    print(f"Feature dimension  : {X.shape[1]} (EXPECTED = 8)")
+    print("Class distribution :")
+    print("  Real   :", np.sum(y == 0))
+    print("  Edited :", np.sum(y == 1))
+    print("  AI     :", np.sum(y == 2))
 
+    # -------- TRAIN MODEL --------
+    model = train_model(X, y)
 
-# -------- DATA SUMMARY --------
-print("\n========== TRAINING DATA SUMMARY ==========")
-print(f"Total samples      : {len(X)}")
-print(f"Feature dimension  : {X.shape[1]} (EXPECTED = 8)")
-print("Class distribution :")
-print("  Real   :", np.sum(y == 0))
-print("  Edited :", np.sum(y == 1))
-print("  AI     :", np.sum(y == 2))
+    # Replaced whole: evaluate / search may have the old ones mapped
+    with atomic_write("X_train.npy") as f:
+        np.save(f, X)
+    with atomic_write("y_train.npy") as f:
+        np.save(f, y)
 
-# -------- TRAIN MODEL --------
-model = train_model(X, y)
+    # -------- MODEL INFO --------
+    print("\n========== MODEL DETAILS ==========")
+    print("Model type       :", type(model).__name__)
+    print("Number of trees  :", model.n_estimators)
+    print("Max depth        :", model.max_depth)
+    print("Classes learned  :", model.classes_)
 
-np.save("X_train.npy", X)
-np.save("y_train.npy", y)
+    # -------- SAVE MODEL --------
+    save_model(model)
+    export_forest(model)
 
-# -------- MODEL INFO --------
-print("\n========== MODEL DETAILS ==========")
-print("Model type       :", type(model).__name__)
-print("Number of trees  :", model.n_estimators)
-print("Max depth        :", model.max_depth)
-print("Classes learned  :", model.classes_)
+    print("\n ML model trained and saved successfully")
 
-# -------- SAVE MODEL --------
-save_model(model)
 
-print("\n ML model trained and saved successfully")
+# Guard required: worker processes re-import this module on spawn (Windows/macOS)
+if __name__ == "__main__":
+    main()
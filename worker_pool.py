@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from analyzer import analyze_images
+from cascade import analyze_images_cascade
+from context import ImageAnalysisContext
+from log_config import configure_logging
+from model_registry import get_registry
+from near_duplicate import analyze_with_reuse
+
+logger = logging.getLogger(__name__)
+
+# ---------------- POOL CONFIG (env overridable) ----------------
+WORKERS = int(os.environ.get("TRUEFRAME_WORKERS", os.cpu_count() or 1))
+MAX_PENDING = int(os.environ.get("TRUEFRAME_MAX_PENDING", WORKERS * 4))
+JOB_TIMEOUT = float(os.environ.get("TRUEFRAME_JOB_TIMEOUT", 60))
+
+
+class PoolBusyError(Exception):
+    """Raised when the bounded job queue is full"""
+
+
+class UndecodableImageError(ValueError):
+    """Raised by a worker job when the upload is empty or not a readable image"""
+
+
+# ---------------- WORKER-SIDE FUNCTIONS ----------------
+def init_worker():
+    # Spawned workers start without the parent's logging setup
+    configure_logging()
+    # Every worker keeps its own resident, warmed-up model
+    get_registry().warm_up()
+
+
+def _ping():
+    return os.getpid()
+
+
+def run_job(fn, *args):
+    """Worker-side wrapper: the job's result plus the metrics it recorded"""
+    return fn(*args), metrics.drain()
+
+
+def analyze_upload(data, name=None, scale=1, cascade=False):
+    """
+    Worker job: runs the full pipeline (or the early-exit cascade) on the
+    raw upload bytes. Pixels and EXIF are decoded straight from memory,
+    no temp file. Near-duplicates of earlier uploads reuse their results
+    when TRUEFRAME_NEARDUP is on.
+    """
+    ctx = ImageAnalysisContext(data, name=name, scale=scale)
+    if ctx.gray is None:
+        raise UndecodableImageError("could not decode image")
+    analyze = analyze_images_cascade if cascade else analyze_images
+    return analyze_with_reuse([ctx], analyze, cascade)[0]
+
+
+# ---------------- ASYNC FRONT-END ----------------
+class AnalysisPool:
+    """
+    Process pool for CPU-bound analysis, driven from async handlers.
+
+    At most max_pending jobs may be queued or running at once; beyond
+    that submit() raises PoolBusyError instead of piling up work, or,
+    with wait=True, waits for a free slot (asyncio.Semaphore). Each
+    job is awaited with a timeout (asyncio.TimeoutError); a queued job is
+    cancelled, while one that is already running cannot be interrupted
+    and keeps its slot until it finishes in the background.
+
+    If a worker dies (OOM kill, signal) the executor is broken for good:
+    the jobs in flight on it fail with BrokenProcessPool, and the pool
+    is rebuilt so later submissions run normally.
+    """
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, timeout=JOB_TIMEOUT):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.pending = 0
+        self._executor = None
+        self._slots = None
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_worker
+        )
+
+    def start(self):
+        # Created here so it belongs to the serving event loop
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._executor = self._new_executor()
+        # Spawn every worker now so model loading happens before traffic
+        wait([self._executor.submit(_ping) for _ in range(self.workers)])
+
+    def _restart(self, broken):
+        # Only the first job to notice replaces the executor; its
+        # remaining futures have already failed
+        if self._executor is not broken:
+            return
+        logger.error("Analysis worker died; restarting the process pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_executor()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, fn, *args, wait=False):
+        if self._slots.locked() and not wait:
+            raise PoolBusyError(f"{self.pending} analysis jobs already pending")
+        await self._slots.acquire()
+
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            try:
+                future = executor.submit(run_job, fn, *args)
+            except BrokenProcessPool:
+                # Broke after the last job finished; this job never ran
+                self._restart(executor)
+                executor = self._executor
+                future = executor.submit(run_job, fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self.pending += 1
+        metrics.QUEUE_DEPTH.set(self.pending)
+        future.add_done_callback(lambda f: self._finished(loop, f))
+
+        try:
+            result, _ = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+        return result
+
+    def _finished(self, loop, future):
+        # Runs on the executor's thread. Worker metrics are merged even
+        # when the caller already timed out; the slot is released on the loop.
+        if not future.cancelled() and future.exception() is None:
+            metrics.merge(future.result()[1])
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._release)
+
+    def _release(self):
+        self.pending -= 1
+        metrics.QUEUE_DEPTH.set(self.pending)
+        self._slots.release()